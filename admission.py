@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import load_environment
+from encryption import BCRYPT_POOL_SIZE
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+
+# Route classes and their defaults: (concurrency, queue, seconds a request may wait for a slot)
+_DEFAULT_AUTH_CONCURRENCY = max(BCRYPT_POOL_SIZE, 1) * 2
+ROUTE_CLASSES = {
+  # bcrypt-bound routes; a few requests per pool process keep the pool busy without queueing behind it
+  "auth": (_DEFAULT_AUTH_CONCURRENCY, _DEFAULT_AUTH_CONCURRENCY * 4, 2.0),
+  # bulk onboarding holds the hashing pool for a long time, so only one runs per worker
+  "bulk": (1, 0, 0.0),
+}
+
+
+def _class_setting(name: str, setting: str, default):
+  return type(default)(os.getenv(f"ADMISSION_{name.upper()}_{setting}", default))
+
+
+def admission_class(name: str):
+  """Mark an endpoint as belonging to a route class. Place it below the router decorator."""
+  if name not in ROUTE_CLASSES:
+    raise ValueError(f"Unknown route class: {name}")
+
+  def mark(endpoint: Callable) -> Callable:
+    endpoint.admission_class = name
+    return endpoint
+
+  return mark
+
+
+class RouteClassLimiter:
+  """Concurrency limit with a bounded FIFO wait queue for one route class."""
+
+  def __init__(self, name: str, concurrency: int, queue: int, timeout: float):
+    self.name = name
+    self.concurrency = concurrency
+    self.queue = queue
+    self.timeout = timeout
+    self.active = 0
+    self.admitted = 0
+    self.rejected = 0
+    self.timeouts = 0
+    self._waiters: Deque[asyncio.Future] = deque()
+
+  async def acquire(self) -> bool:
+    """Take a slot, waiting up to timeout in the queue. Returns False when the request should be shed."""
+    if self.active < self.concurrency and not self._waiters:
+      self.active += 1
+      self.admitted += 1
+      return True
+
+    if len(self._waiters) >= self.queue:
+      self.rejected += 1
+      return False
+
+    waiter = asyncio.get_running_loop().create_future()
+    self._waiters.append(waiter)
+    try:
+      await asyncio.wait_for(waiter, self.timeout)
+    except asyncio.TimeoutError:
+      # A slot handed over just as the timeout fired is still ours
+      if not _handed_over(waiter):
+        self.timeouts += 1
+        return False
+    except asyncio.CancelledError:
+      if _handed_over(waiter):
+        self.release()
+      raise
+    finally:
+      if waiter in self._waiters:
+        self._waiters.remove(waiter)
+
+    # release() handed its slot over, so active is unchanged
+    self.admitted += 1
+    return True
+
+  def release(self):
+    while self._waiters:
+      waiter = self._waiters.popleft()
+      if not waiter.done():
+        waiter.set_result(True)
+        return
+    self.active -= 1
+
+  def stats(self) -> Dict[str, Any]:
+    return {
+      "concurrency": self.concurrency,
+      "queue_limit": self.queue,
+      "active": self.active,
+      "queued": len(self._waiters),
+      "admitted": self.admitted,
+      "rejected": self.rejected,
+      "timeouts": self.timeouts,
+    }
+
+
+def _handed_over(waiter: asyncio.Future) -> bool:
+  return waiter.done() and not waiter.cancelled()
+
+
+limiters = {
+  name: RouteClassLimiter(
+    name,
+    _class_setting(name, "CONCURRENCY", concurrency),
+    _class_setting(name, "QUEUE", queue),
+    _class_setting(name, "TIMEOUT", timeout),
+  )
+  for name, (concurrency, queue, timeout) in ROUTE_CLASSES.items()
+}
+
+
+def admission_stats() -> Dict[str, Any]:
+  return {"enabled": ADMISSION_ENABLED, "classes": {name: limiter.stats() for name, limiter in limiters.items()}}
+
+
+_OVERLOADED_BODY = json.dumps({"detail": "Service overloaded, please retry"}).encode()
+
+
+class AdmissionMiddleware:
+  """
+  ASGI middleware applying the limiter of the request's route class before the request reaches the app.
+
+  Routes are classified with admission_class; unmarked routes are never queued or shed, so cheap reads keep
+  their latency while the CPU-heavy classes are saturated.
+  """
+
+  def __init__(self, app: ASGIApp):
+    self.app = app
+    self._marked: Optional[List[Tuple[Any, RouteClassLimiter]]] = None
+
+  def _classify(self, scope: Scope) -> Optional[RouteClassLimiter]:
+    if self._marked is None:
+      # Routes are all registered by the time the first request arrives
+      self._marked = [
+        (route, limiters[route.endpoint.admission_class])
+        for route in scope["app"].routes
+        if getattr(getattr(route, "endpoint", None), "admission_class", None) in limiters
+      ]
+    for route, limiter in self._marked:
+      match, _ = route.matches(scope)
+      if match == Match.FULL:
+        # Lets outer middleware label shed requests with their route template
+        scope["route"] = route
+        return limiter
+    return None
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send):
+    if not ADMISSION_ENABLED or scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    limiter = self._classify(scope)
+    if limiter is None:
+      await self.app(scope, receive, send)
+      return
+
+    if not await limiter.acquire():
+      logger.debug(f"Shedding {scope['method']} {scope['path']} ({limiter.name} saturated)")
+      await _send_overloaded(send)
+      return
+
+    try:
+      await self.app(scope, receive, send)
+    finally:
+      limiter.release()
+
+
+async def _send_overloaded(send: Send):
+  await send({
+    "type": "http.response.start",
+    "status": 503,
+    "headers": [
+      (b"content-type", b"application/json"),
+      (b"content-length", str(len(_OVERLOADED_BODY)).encode()),
+      (b"retry-after", b"1"),
+    ],
+  })
+  await send({"type": "http.response.body", "body": _OVERLOADED_BODY})
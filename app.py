@@ -1,34 +1,80 @@
+import time
+
+_import_started = time.perf_counter()
+
+import logging
 import os
 from contextlib import asynccontextmanager
 
 import uvicorn
-from dotenv import load_dotenv
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from admission import AdmissionMiddleware, admission_stats
+from aws.sqs import start_publisher, stop_publisher
 from config import load_environment
-from db.database import init_db, insert_static, insert_test_data
+from db.database import db_pool_status, engine, init_db, insert_static, insert_test_data
+from encryption import shutdown_hashing_pool
+from metrics import MetricsMiddleware, mark_worker_exited, render_metrics
+from profiling import PROFILING_ENABLED, ProfilingMiddleware, install as install_profiling
+from rate_limit import rate_limit_stats
+from repository.cache import cache_stats
 from routes import account, auth, company, store
+from serialization import DEFAULT_RESPONSE_CLASS
+from session_cache import session_cache, start_invalidation_listener, stop_invalidation_listener
+from session_tokens import start_revocation_sync, stop_revocation_sync
 
-load_dotenv()
 load_environment()
 
+logger = logging.getLogger(__name__)
+
 ENVIRONMENT = os.getenv("ENVIRONMENT", "prod")
 
+_import_ms = (time.perf_counter() - _import_started) * 1000
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-  """Initialize the database at startup."""
-  await init_db()
-  await insert_static()
+  """Initialize the database at startup and release worker pools on shutdown."""
+  timings = {"imports": _import_ms}
+
+  async def step(name, coro):
+    start = time.perf_counter()
+    await coro
+    timings[name] = (time.perf_counter() - start) * 1000
+
+  await step("migrations", init_db())
+  await step("seed_roles", insert_static())
 
   if ENVIRONMENT == "local":
-    await insert_test_data()
+    await step("test_data", insert_test_data())
+
+  await step("sqs_publisher", start_publisher())
+  await step("session_invalidation", start_invalidation_listener())
+  await step("revocation_sync", start_revocation_sync())
+
+  logger.info(f"Worker {os.getpid()} ready in {sum(timings.values()):.0f} ms ("
+              + ", ".join(f"{name}={ms:.0f}ms" for name, ms in timings.items()) + ")")
 
   yield
 
+  await stop_revocation_sync()
+  await stop_invalidation_listener()
+  # Drain queued SQS messages before the worker exits
+  await stop_publisher()
+  shutdown_hashing_pool()
+  mark_worker_exited()
+
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=DEFAULT_RESPONSE_CLASS)
+
+# Innermost, so a profile covers the request itself and not the wait for admission
+if PROFILING_ENABLED:
+  install_profiling(engine)
+  app.add_middleware(ProfilingMiddleware)
+
+# Added before CORS so shed requests still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
 
 app.add_middleware(
   CORSMiddleware,
@@ -38,6 +84,9 @@ app.add_middleware(
   allow_headers=["*"],
 )
 
+# Outermost, so latency includes CORS handling and requests shed by admission control
+app.add_middleware(MetricsMiddleware)
+
 router = APIRouter(prefix="/account-mgr")
 
 
@@ -48,6 +97,43 @@ async def health_check():
   return {"status": "healthy"}
 
 
+@router.get("/metrics", tags=["System"])
+async def metrics():
+  """Prometheus metrics, aggregated across workers when PROMETHEUS_MULTIPROC_DIR is set."""
+  body, content_type = render_metrics()
+  return Response(content=body, media_type=content_type)
+
+
+@router.get("/stats/session-cache", tags=["System"])
+async def session_cache_stats():
+  """Hit, miss and eviction counters of this worker's session cache."""
+  return session_cache.stats()
+
+
+@router.get("/stats/cache", tags=["System"])
+async def lookup_cache_stats():
+  """Hit ratio and latency of this worker's company and store lookup cache."""
+  return cache_stats()
+
+
+@router.get("/stats/rate-limit", tags=["System"])
+async def login_rate_limit_stats():
+  """Allowed and rejected attempts on this worker's throttled credential endpoints."""
+  return rate_limit_stats()
+
+
+@router.get("/stats/admission", tags=["System"])
+async def route_admission_stats():
+  """Active, queued and rejected requests per route class on this worker."""
+  return admission_stats()
+
+
+@router.get("/stats/db-pool", tags=["System"])
+async def database_pool_stats():
+  """Checked-out connections, checkout counts and wait times of this worker's database pool."""
+  return db_pool_status()
+
+
 # Other routes
 router.include_router(auth.router, tags=["Authentication"])
 router.include_router(account.router, prefix="/account", tags=["Account"])
@@ -1,30 +1,50 @@
+import asyncio
+import logging
 import os
+import time
 import uuid
+from typing import List, Optional, Tuple
 
-import boto3
-from dotenv import load_dotenv
+from config import load_environment
+from metrics import SQS_BATCH_DURATION, SQS_PUBLISH_DURATION
 
-ENVIRONMENT = os.getenv("ENVIRONMENT", "prod")
+load_environment()
 
-if ENVIRONMENT == "prod":
-  load_dotenv(".env.production")
-elif ENVIRONMENT == "local":
-  load_dotenv(".env.local")
-else:
-  load_dotenv(".env")
+logger = logging.getLogger(__name__)
 
 # AWS SQS Configuration
 AWS_REGION = os.getenv("AWS_REGION")
 AWS_SQS_EMAIL_URL = os.getenv("AWS_SQS_EMAIL_URL")
 AWS_SQS_QUEUE_URL = os.getenv("AWS_SQS_QUEUE_URL")
+AWS_SQS_ENDPOINT_URL = os.getenv("AWS_SQS_ENDPOINT_URL")  # Local stand-in such as moto_server
 
-# Create SQS client
-sqs_client = boto3.client(
-  "sqs",
-  region_name=AWS_REGION,
-  aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-  aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-)
+# Publisher configuration. SendMessageBatch accepts at most 10 entries.
+SQS_BATCH_SIZE = min(int(os.getenv("SQS_BATCH_SIZE", 10)), 10)
+SQS_LINGER_MS = float(os.getenv("SQS_LINGER_MS", 20))
+SQS_MAX_QUEUED = int(os.getenv("SQS_MAX_QUEUED", 10000))
+
+_sqs_client = None
+
+
+def get_sqs_client():
+  """
+  Return the SQS client, creating it on first use.
+
+  Importing boto3 and loading the SQS service model takes a noticeable share of
+  worker startup, so it is deferred until the first message is sent.
+  """
+  global _sqs_client
+  if _sqs_client is None:
+    import boto3
+
+    _sqs_client = boto3.client(
+      "sqs",
+      region_name=AWS_REGION,
+      endpoint_url=AWS_SQS_ENDPOINT_URL,
+      aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+      aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+    )
+  return _sqs_client
 
 
 def get_sqs_queue_url(type: str):
@@ -39,21 +59,202 @@ def get_sqs_queue_url(type: str):
     return 'not-configured'
 
 
+# (queue url, message body, message group id, delivery future)
+_Message = Tuple[str, str, str, asyncio.Future]
+
+_STOP = object()
+
+
+class SqsPublisher:
+  """
+  Background task that batches outgoing messages into SendMessageBatch calls.
+
+  Messages are flushed once a batch is full or the oldest queued message has
+  waited SQS_LINGER_MS. Entries keep their enqueue order, so FIFO queues see
+  messages of the same MessageGroupId in the order they were published.
+  """
+
+  def __init__(self, client=None, batch_size: int = SQS_BATCH_SIZE, linger_ms: float = SQS_LINGER_MS,
+               max_queued: int = SQS_MAX_QUEUED):
+    self._client = client
+    self._batch_size = batch_size
+    self._linger = linger_ms / 1000
+    self._max_queued = max_queued
+    self._queue: Optional[asyncio.Queue] = None
+    self._task: Optional[asyncio.Task] = None
+    self._stopping = False
+
+  @property
+  def running(self) -> bool:
+    return self._task is not None and not self._task.done()
+
+  @property
+  def accepting(self) -> bool:
+    """Whether publish may be called: the task is running and not shutting down."""
+    return self.running and not self._stopping
+
+  async def start(self):
+    if self.running:
+      return
+    self._queue = asyncio.Queue(maxsize=self._max_queued)
+    self._stopping = False
+    self._task = asyncio.create_task(self._run(), name="sqs-publisher")
+
+  async def stop(self):
+    """Flush everything already queued, then stop the background task."""
+    if not self.running:
+      return
+    self._stopping = True
+    await self._queue.put(_STOP)
+    await self._task
+    self._task = None
+
+  def publish(self, message_body: str, message_group_id: str, type: str = "queue") -> asyncio.Future:
+    """Queue a message and return a future resolving to True once SQS has accepted it."""
+    future = asyncio.get_running_loop().create_future()
+    self._queue.put_nowait((get_sqs_queue_url(type), message_body, message_group_id, future))
+    return future
+
+  async def _run(self):
+    loop = asyncio.get_running_loop()
+    stopping = False
+    batch: List[_Message] = []
+
+    try:
+      while not stopping:
+        item = await self._queue.get()
+        if item is _STOP:
+          break
+
+        batch = [item]
+        deadline = loop.time() + self._linger
+        while len(batch) < self._batch_size:
+          timeout = deadline - loop.time()
+          if timeout <= 0:
+            break
+          try:
+            item = await asyncio.wait_for(self._queue.get(), timeout)
+          except asyncio.TimeoutError:
+            break
+          if item is _STOP:
+            stopping = True
+            break
+          batch.append(item)
+
+        await self._flush_safely(batch)
+
+      # Messages queued behind the stop marker are still sent
+      leftover = self._drain()
+      for index in range(0, len(leftover), self._batch_size):
+        batch = leftover[index:index + self._batch_size]
+        await self._flush_safely(batch)
+    finally:
+      # Only finds unresolved messages when the task was cancelled; their callers must not wait forever
+      for *_, future in [*batch, *self._drain()]:
+        _resolve(future, False)
+
+  def _drain(self) -> List[_Message]:
+    items = []
+    while not self._queue.empty():
+      item = self._queue.get_nowait()
+      if item is not _STOP:
+        items.append(item)
+    return items
+
+  async def _flush_safely(self, batch: List[_Message]):
+    """Flush a batch, failing its messages on any unexpected error so the loop keeps running."""
+    try:
+      await self._flush(batch)
+    except Exception as e:
+      logger.error(f"Failed to publish {len(batch)} message(s) to SQS: {str(e)}")
+      for *_, future in batch:
+        _resolve(future, False)
+
+  async def _flush(self, batch: List[_Message]):
+    # Group by destination queue while preserving the original order inside each group
+    by_queue = {}
+    for message in batch:
+      by_queue.setdefault(message[0], []).append(message)
+
+    for queue_url, messages in by_queue.items():
+      entries = [
+        {
+          "Id": str(index),
+          "MessageBody": body,
+          "MessageGroupId": group_id,
+          "MessageDeduplicationId": str(uuid.uuid4()),
+        }
+        for index, (_, body, group_id, _) in enumerate(messages)
+      ]
+
+      start = time.perf_counter()
+      try:
+        client = self._client or get_sqs_client()
+        response = await asyncio.to_thread(client.send_message_batch, QueueUrl=queue_url, Entries=entries)
+        SQS_BATCH_DURATION.labels("ok").observe(time.perf_counter() - start)
+      except Exception as e:
+        SQS_BATCH_DURATION.labels("error").observe(time.perf_counter() - start)
+        logger.error(f"Failed to send {len(entries)} message(s) to SQS: {str(e)}")
+        for *_, future in messages:
+          _resolve(future, False)
+        continue
+
+      for success in response.get("Successful", []):
+        _resolve(messages[int(success["Id"])][3], True)
+      for failure in response.get("Failed", []):
+        logger.error(f"SQS rejected message: {failure.get('Code')} {failure.get('Message')}")
+        _resolve(messages[int(failure["Id"])][3], False)
+
+      logger.debug(f"Sent batch of {len(entries)} message(s) to SQS")
+
+
+def _resolve(future: asyncio.Future, result: bool):
+  # The caller may have been cancelled while the batch was in flight
+  if not future.done():
+    future.set_result(result)
+
+
+publisher = SqsPublisher()
+
+
+async def start_publisher():
+  await publisher.start()
+
+
+async def stop_publisher():
+  await publisher.stop()
+
+
 async def send_message(message_body: str, message_group_id: str, type: str = "queue"):
   """
   Sends a message to AWS SQS.
+
+  Goes through the batching publisher when it is running, otherwise sends the
+  message directly. Returns True if SQS accepted the message.
   """
+  start = time.perf_counter()
+  # A stopping publisher may already have drained its queue, so late messages are sent directly
+  if publisher.accepting:
+    try:
+      sent = await publisher.publish(message_body, message_group_id, type)
+      SQS_PUBLISH_DURATION.labels("batched", "ok" if sent else "error").observe(time.perf_counter() - start)
+      return sent
+    except asyncio.QueueFull:
+      logger.warning("SQS publisher queue is full, sending message directly")
+
   try:
-    response = sqs_client.send_message(
+    response = await asyncio.to_thread(
+      get_sqs_client().send_message,
       QueueUrl=get_sqs_queue_url(type),
       MessageBody=message_body,
       MessageGroupId=message_group_id,
       MessageDeduplicationId=str(uuid.uuid4())
     )
 
-    print("🚀 Message sent successfully 🚀")
-    print({"MessageId": response["MessageId"], "Response": response})
+    logger.debug(f"Message sent successfully: {response['MessageId']}")
+    SQS_PUBLISH_DURATION.labels("direct", "ok").observe(time.perf_counter() - start)
     return True
   except Exception as e:
-    print({"error": str(e)})
+    logger.error(f"Failed to send message to SQS: {str(e)}")
+    SQS_PUBLISH_DURATION.labels("direct", "error").observe(time.perf_counter() - start)
     return False
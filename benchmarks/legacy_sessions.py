@@ -0,0 +1,35 @@
+"""Writers and readers for the pre-msgpack session format, kept for before/after comparisons."""
+import time
+import uuid
+from typing import Any, Dict
+
+from redis.asyncio import Redis
+
+from session_manager import SESSION_EXPIRY, SESSION_PREFIX, TOKEN_PREFIX
+
+
+async def create_legacy_session(valkey: Redis, email: str, user_id: str, user_data: Dict[str, Any]) -> str:
+  """Store a session the way it was stored before: a token string plus a hash per email."""
+  session_token = str(uuid.uuid4())
+  now = int(time.time())
+  session_data = {
+    "session_token": session_token,
+    "user_id": user_id,
+    "email": email,
+    "created_at": now,
+    "expires_at": now + SESSION_EXPIRY,
+    **{f"user_{k}": str(v) for k, v in user_data.items()}
+  }
+
+  await valkey.set(f"{TOKEN_PREFIX}{session_token}", email, ex=SESSION_EXPIRY)
+  await valkey.hset(f"{SESSION_PREFIX}{email}", mapping=session_data)
+  await valkey.expire(f"{SESSION_PREFIX}{email}", SESSION_EXPIRY)
+  return session_token
+
+
+async def legacy_get_current_user(valkey: Redis, session_token: str):
+  """The sequential GET + HGETALL lookup used before single-round-trip verification."""
+  email = await valkey.get(f"{TOKEN_PREFIX}{session_token}")
+  if not email:
+    return None
+  return await valkey.hgetall(f"{SESSION_PREFIX}{email}")
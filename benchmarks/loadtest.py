@@ -0,0 +1,304 @@
+"""
+End-to-end load test of the HTTP API with realistic request mixes.
+
+Starts benchmarks.offline_server (fakeredis, mocked SQS, local Postgres) unless
+--url points at a running instance, seeds an owner, a company, stores and
+confirmed staff through the API, then drives each mix with a closed-loop
+async load generator. Prints throughput and p50/p95/p99 per route as JSON, so
+runs before and after a change can be compared.
+
+Mixes:
+    login_storm     logins, with some session checks
+    session_check   authenticated session checks, with some logins
+    store_lookup    store and company reads by id, page and batch
+    bulk_write      store creates and edits, with bulk staff onboarding
+
+Data created by a run is left in the database under loadtest-<run>-* emails.
+
+Usage:
+    pip install -r benchmarks/requirements.txt
+    ENVIRONMENT=local python -m benchmarks.loadtest --duration 30 --concurrency 32 --output loadtest.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.stats import summarize
+
+PREFIX = "/account-mgr"
+BULK_ROWS = 20  # employees per bulk onboarding request
+
+# Operation name -> weight, per mix
+MIXES = {
+  "login_storm": {"login": 8, "session_check": 2},
+  "session_check": {"session_check": 9, "login": 1},
+  "store_lookup": {"store_details": 5, "store_list": 2, "store_batch": 2, "company_details": 1},
+  "bulk_write": {"store_create": 4, "store_edit": 5, "bulk_onboard": 1},
+}
+
+
+class Fixture:
+  """Accounts, company and stores seeded for one run."""
+
+  def __init__(self, run: str, password: str):
+    self.run = run
+    self.password = password
+    self.users: List[str] = []
+    self.tokens: List[str] = []
+    self.company_id = ""
+    self.c_id = 0
+    self.stores: List[Dict[str, Any]] = []
+    self.counter = 0
+
+  def email(self, kind: str) -> str:
+    self.counter += 1
+    return f"loadtest-{self.run}-{kind}-{self.counter}@example.com"
+
+
+async def call(client: httpx.AsyncClient, method: str, url: str, expected: int, **kwargs) -> httpx.Response:
+  """Request used while seeding; retries while the service sheds load and fails on any other status."""
+  for _ in range(50):
+    response = await client.request(method, url, **kwargs)
+    if response.status_code != 503:
+      break
+    await asyncio.sleep(0.2)
+  if response.status_code != expected:
+    raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.text}")
+  return response
+
+
+async def register_user(client: httpx.AsyncClient, fixture: Fixture, email: str):
+  await call(client, "POST", f"{PREFIX}/register", 201,
+             json={"email": email, "first_name": "Load", "last_name": "Test", "password": fixture.password})
+  await call(client, "POST", f"{PREFIX}/confirm-email", 200, json={"email": email})
+
+
+async def seed(client: httpx.AsyncClient, users: int, stores: int) -> Fixture:
+  run = uuid.uuid4().hex[:8]
+  fixture = Fixture(run, f"Loadtest-{run}")
+
+  owner = fixture.email("owner")
+  await register_user(client, fixture, owner)
+  user_id = (await call(client, "GET", f"{PREFIX}/account/profile/{owner}", 200)).json()["id"]
+
+  company = {"name": f"Loadtest {run}", "uen": f"LT{run}", "email": owner, "user_id": user_id}
+  fixture.company_id = (await call(client, "POST", f"{PREFIX}/company/create", 201, json=company)).json()["id"]
+  companies = (await call(client, "GET", f"{PREFIX}/company/get/{user_id}", 200)).json()
+  fixture.c_id = next(c["cId"] for c in companies if c["id"] == fixture.company_id)
+
+  for i in range(stores):
+    await call(client, "POST", f"{PREFIX}/store/create", 201,
+               json={"name": f"Store {i}", "alias": f"S{i}", "company_id": fixture.company_id})
+  fixture.stores = (await call(client, "GET", f"{PREFIX}/store/get/{fixture.c_id}", 200)).json()
+
+  # Registration and login are bcrypt-bound, so seed a few at a time
+  semaphore = asyncio.Semaphore(4)
+
+  async def add_user():
+    async with semaphore:
+      email = fixture.email("user")
+      await register_user(client, fixture, email)
+      response = await call(client, "POST", f"{PREFIX}/login", 200, json={"email": email, "password": fixture.password})
+      fixture.users.append(email)
+      fixture.tokens.append(response.json()["session_token"])
+
+  await asyncio.gather(*(add_user() for _ in range(users)))
+  return fixture
+
+
+# Each operation returns the route it hit, labelled by template, and the response
+Operation = Callable[[httpx.AsyncClient, Fixture, random.Random], Awaitable[Tuple[str, httpx.Response]]]
+
+
+async def login(client, fixture, rng):
+  email = rng.choice(fixture.users)
+  return "POST /login", await client.post(f"{PREFIX}/login", json={"email": email, "password": fixture.password})
+
+
+async def session_check(client, fixture, rng):
+  headers = {"X-Session-Token": rng.choice(fixture.tokens)}
+  return "GET /session-check", await client.get(f"{PREFIX}/session-check", headers=headers)
+
+
+async def store_details(client, fixture, rng):
+  s_id = rng.choice(fixture.stores)["sId"]
+  return "GET /store/details/{s_id}", await client.get(f"{PREFIX}/store/details/{s_id}")
+
+
+async def store_list(client, fixture, rng):
+  return "GET /store/get/{c_id}", await client.get(f"{PREFIX}/store/get/{fixture.c_id}", params={"limit": 50})
+
+
+async def store_batch(client, fixture, rng):
+  s_ids = [store["sId"] for store in rng.sample(fixture.stores, min(20, len(fixture.stores)))]
+  return "POST /store/details/batch", await client.post(f"{PREFIX}/store/details/batch", json={"sIds": s_ids})
+
+
+async def company_details(client, fixture, rng):
+  return "GET /company/get/details/{c_id}", await client.get(f"{PREFIX}/company/get/details/{fixture.c_id}")
+
+
+async def store_create(client, fixture, rng):
+  body = {"name": f"Store {rng.randrange(1_000_000)}", "alias": None, "company_id": fixture.company_id}
+  return "POST /store/create", await client.post(f"{PREFIX}/store/create", json=body)
+
+
+async def store_edit(client, fixture, rng):
+  store = rng.choice(fixture.stores)
+  body = {"id": store["id"], "name": f"Store {rng.randrange(1_000_000)}", "alias": store["alias"]}
+  return "POST /store/edit", await client.post(f"{PREFIX}/store/edit", json=body)
+
+
+async def bulk_onboard(client, fixture, rng):
+  rows = [{"email": fixture.email("staff"), "first_name": "Load", "last_name": "Test"} for _ in range(BULK_ROWS)]
+  return "POST /register/staff/bulk", await client.post(
+    f"{PREFIX}/register/staff/bulk", params={"c_id": fixture.c_id}, json=rows
+  )
+
+
+OPERATIONS: Dict[str, Operation] = {
+  "login": login,
+  "session_check": session_check,
+  "store_details": store_details,
+  "store_list": store_list,
+  "store_batch": store_batch,
+  "company_details": company_details,
+  "store_create": store_create,
+  "store_edit": store_edit,
+  "bulk_onboard": bulk_onboard,
+}
+
+
+async def run_mix(client: httpx.AsyncClient, fixture: Fixture, weights: Dict[str, int], concurrency: int,
+                  duration: float, warmup: float, seed: int) -> Dict[str, Any]:
+  """Keep concurrency virtual users busy for warmup + duration seconds; only the duration is reported."""
+  names, rates = list(weights), list(weights.values())
+  samples: Dict[str, List[float]] = defaultdict(list)
+  statuses: Dict[str, Counter] = defaultdict(Counter)
+  loop = asyncio.get_running_loop()
+  measure_from = loop.time() + warmup
+  stop_at = measure_from + duration
+
+  async def virtual_user(index: int):
+    rng = random.Random(seed * 1000 + index)
+    while loop.time() < stop_at:
+      operation = OPERATIONS[rng.choices(names, rates)[0]]
+      start = time.perf_counter()
+      try:
+        route, response = await operation(client, fixture, rng)
+        status = str(response.status_code)
+      except httpx.HTTPError as e:
+        route, status = operation.__name__, type(e).__name__
+      elapsed_ms = (time.perf_counter() - start) * 1000
+      if loop.time() >= measure_from:
+        samples[route].append(elapsed_ms)
+        statuses[route][status] += 1
+
+  await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+
+  total = sum(len(route_samples) for route_samples in samples.values())
+  errors = sum(count for counter in statuses.values() for status, count in counter.items()
+               if not status.isdigit() or int(status) >= 500)
+  return {
+    "requests": total,
+    "throughput_rps": round(total / duration, 1),
+    "errors": errors,
+    "routes": {
+      route: {
+        **summarize(route_samples),
+        "throughput_rps": round(len(route_samples) / duration, 1),
+        "statuses": dict(statuses[route]),
+      }
+      for route, route_samples in sorted(samples.items())
+    },
+  }
+
+
+async def wait_until_healthy(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float):
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    if server is not None and server.poll() is not None:
+      raise RuntimeError(f"Server exited with code {server.returncode} during startup")
+    try:
+      if (await client.get(f"{PREFIX}/health")).status_code == 200:
+        return
+    except httpx.TransportError:
+      pass
+    await asyncio.sleep(0.5)
+  raise RuntimeError(f"Server not healthy after {timeout:.0f} s")
+
+
+def start_server(port: int, valkey: str) -> subprocess.Popen:
+  return subprocess.Popen(
+    [sys.executable, "-m", "benchmarks.offline_server", "--port", str(port), "--valkey", valkey]
+  )
+
+
+def stop_server(server: subprocess.Popen):
+  # SIGINT lets uvicorn run the lifespan shutdown, which drains the SQS publisher
+  server.send_signal(signal.SIGINT)
+  try:
+    server.wait(timeout=30)
+  except subprocess.TimeoutExpired:
+    server.kill()
+
+
+async def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--url", help="Target a running instance instead of starting benchmarks.offline_server")
+  parser.add_argument("--port", type=int, default=5055, help="Port of the started server")
+  parser.add_argument("--valkey", choices=("fake", "external"), default="fake", help="Valkey of the started server")
+  parser.add_argument("--mix", action="append", choices=sorted(MIXES), help="Mix to run, repeatable (default: all)")
+  parser.add_argument("--duration", type=float, default=30, help="Measured seconds per mix")
+  parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before each mix")
+  parser.add_argument("--concurrency", type=int, default=32, help="Virtual users")
+  parser.add_argument("--users", type=int, default=50, help="Confirmed accounts to log in with")
+  parser.add_argument("--stores", type=int, default=100, help="Stores of the seeded company")
+  parser.add_argument("--seed", type=int, default=1, help="Random seed of the virtual users")
+  parser.add_argument("--output", help="Also write the report to this file")
+  args = parser.parse_args()
+
+  server = None if args.url else start_server(args.port, args.valkey)
+  base_url = args.url or f"http://127.0.0.1:{args.port}"
+  limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+  try:
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+      await wait_until_healthy(client, server, timeout=120)
+      fixture = await seed(client, args.users, args.stores)
+
+      report = {
+        "target": base_url,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "users": args.users,
+        "stores": args.stores,
+        "mixes": {},
+      }
+      for name in args.mix or MIXES:
+        report["mixes"][name] = await run_mix(
+          client, fixture, MIXES[name], args.concurrency, args.duration, args.warmup, args.seed
+        )
+  finally:
+    if server is not None:
+      stop_server(server)
+
+  output = json.dumps(report, indent=2)
+  print(output)
+  if args.output:
+    with open(args.output, "w") as f:
+      f.write(output + "\n")
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
@@ -0,0 +1,213 @@
+"""
+Microbenchmarks of the functions on every request, with regression checks against a saved baseline.
+
+- session_manager.verify_session and get_current_user, against an in-process
+  fakeredis server, with and without the in-process session cache
+- encryption.verify_password at several bcrypt costs
+- encryption.generate_random_password
+- StaffResponse and StoreResponse validation from ORM objects, with the
+  camelize aliases applied on dump
+
+Every benchmark runs a fixed number of iterations after a warm-up, with the
+garbage collector paused, and reports latency percentiles as JSON. With
+--baseline, a benchmark whose p50 grew by more than its threshold is reported
+as a regression and the exit status is 1.
+
+Usage:
+    ENVIRONMENT=local python -m benchmarks.micro --output baseline.json
+    ENVIRONMENT=local python -m benchmarks.micro --baseline baseline.json
+"""
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import platform
+import sys
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Tuple
+
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from passlib.hash import bcrypt
+
+from benchmarks.stats import summarize
+import db.database  # noqa: F401  Must be imported before db.models
+from db.models import StoreTable, UserTable
+from encryption import generate_random_password, verify_password
+from schemas import StaffResponse, StoreResponse
+from session_cache import session_cache
+from session_manager import create_session, get_current_user, verify_session
+from session_tokens import SESSION_MODE
+
+DEFAULT_THRESHOLD = 0.15  # allowed p50 growth over the baseline
+VALKEY_THRESHOLD = 0.25  # in-process Valkey round trips are noisier
+PASSWORD = "Benchmark-password-1"
+
+# bcrypt cost -> iterations; each step up doubles the work
+COSTS = {4: 200, 8: 40, 10: 15, 12: 8}
+
+# (name, iterations, threshold, callable); callables may be coroutine functions
+Benchmark = Tuple[str, int, float, Callable]
+
+
+def measure(func: Callable, iterations: int) -> List[float]:
+  warmup = max(iterations // 10, 1)
+  for _ in range(warmup):
+    func()
+  samples = []
+  gc.collect()
+  gc.disable()
+  try:
+    for _ in range(iterations):
+      start = time.perf_counter()
+      func()
+      samples.append((time.perf_counter() - start) * 1000)
+  finally:
+    gc.enable()
+  return samples
+
+
+async def measure_async(func: Callable, iterations: int) -> List[float]:
+  warmup = max(iterations // 10, 1)
+  for _ in range(warmup):
+    await func()
+  samples = []
+  gc.collect()
+  gc.disable()
+  try:
+    for _ in range(iterations):
+      start = time.perf_counter()
+      await func()
+      samples.append((time.perf_counter() - start) * 1000)
+  finally:
+    gc.enable()
+  return samples
+
+
+def staff_row(i: int) -> UserTable:
+  now = datetime.datetime(2025, 3, 1, 12, 0, 0)
+  return UserTable(
+    id=str(uuid.UUID(int=i)), u_id=i, email=f"staff{i}@example.com", first_name="First", last_name="Last",
+    password="-", role="EMPLOYEE", email_confirmed=True, deactivated=False, company_id=1,
+    created_at=now, updated_at=now, confirmed_at=None,
+  )
+
+
+def store_row(i: int) -> StoreTable:
+  return StoreTable(
+    id=str(uuid.UUID(int=i)), s_id=i, name=f"Store {i}", alias="ST", company_id=str(uuid.UUID(int=1)),
+  )
+
+
+def schema_benchmarks() -> List[Benchmark]:
+  staff, store = staff_row(1), store_row(1)
+  staff_page, store_page = [staff_row(i) for i in range(100)], [store_row(i) for i in range(100)]
+
+  def dump(schema, row):
+    return schema.model_validate(row).model_dump(mode="json", by_alias=True)
+
+  return [
+    ("StaffResponse", 20_000, DEFAULT_THRESHOLD, lambda: dump(StaffResponse, staff)),
+    ("StaffResponse[100]", 500, DEFAULT_THRESHOLD, lambda: [dump(StaffResponse, row) for row in staff_page]),
+    ("StoreResponse", 20_000, DEFAULT_THRESHOLD, lambda: dump(StoreResponse, store)),
+    ("StoreResponse[100]", 500, DEFAULT_THRESHOLD, lambda: [dump(StoreResponse, row) for row in store_page]),
+  ]
+
+
+def password_benchmarks() -> List[Benchmark]:
+  benchmarks = [("generate_random_password", 20_000, DEFAULT_THRESHOLD, generate_random_password)]
+  for cost, iterations in COSTS.items():
+    hashed = bcrypt.using(rounds=cost).hash(PASSWORD)
+    benchmarks.append((f"verify_password[cost={cost}]", iterations, DEFAULT_THRESHOLD,
+                       lambda hashed=hashed: verify_password(PASSWORD, hashed)))
+  return benchmarks
+
+
+async def session_benchmarks(valkey) -> List[Benchmark]:
+  token = await create_session(valkey, "bench@example.com", str(uuid.UUID(int=1)),
+                               {"first_name": "Bench", "last_name": "User", "email_confirmed": True})
+
+  async def current_user_uncached():
+    session_cache.active = False
+    return await get_current_user(request=None, session_token=token, valkey=valkey)
+
+  async def current_user_cached():
+    # The cache only serves entries while the invalidation listener would be running
+    session_cache.active = True
+    return await get_current_user(request=None, session_token=token, valkey=valkey)
+
+  async def session_lookup():
+    return await verify_session(valkey, token)
+
+  benchmarks = [
+    (f"get_current_user[{SESSION_MODE}]", 5_000, VALKEY_THRESHOLD, current_user_uncached),
+    (f"get_current_user[{SESSION_MODE},cached]", 20_000, DEFAULT_THRESHOLD, current_user_cached),
+  ]
+  if SESSION_MODE != "signed":
+    benchmarks.insert(0, ("verify_session", 5_000, VALKEY_THRESHOLD, session_lookup))
+  return benchmarks
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+  comparison = {}
+  for name, result in results.items():
+    before = baseline.get(name)
+    if not before or not before["p50_ms"]:
+      continue
+    change = result["p50_ms"] / before["p50_ms"] - 1
+    comparison[name] = {
+      "baseline_p50_ms": before["p50_ms"],
+      "p50_ms": result["p50_ms"],
+      "change": round(change, 4),
+      "threshold": result["threshold"],
+      "regressed": change > result["threshold"],
+    }
+  return comparison
+
+
+async def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--baseline", help="Results of an earlier run to compare against")
+  parser.add_argument("--output", help="Also write the results to this file, e.g. to use as a baseline")
+  parser.add_argument("--only", action="append", help="Run benchmarks whose name starts with this, repeatable")
+  args = parser.parse_args()
+
+  valkey = FakeRedis(server=FakeServer())
+  benchmarks = [*await session_benchmarks(valkey), *password_benchmarks(), *schema_benchmarks()]
+  if args.only:
+    benchmarks = [b for b in benchmarks if b[0].startswith(tuple(args.only))]
+
+  results = {}
+  for name, iterations, threshold, func in benchmarks:
+    if asyncio.iscoroutinefunction(func):
+      samples = await measure_async(func, iterations)
+    else:
+      samples = measure(func, iterations)
+    results[name] = {**summarize(samples), "threshold": threshold}
+  await valkey.aclose()
+
+  report = {
+    "python": platform.python_version(),
+    "session_mode": SESSION_MODE,
+    "results": results,
+  }
+  if args.baseline:
+    with open(args.baseline) as f:
+      comparison = compare(results, json.load(f)["results"])
+    report["comparison"] = comparison
+    report["regressions"] = [name for name, entry in comparison.items() if entry["regressed"]]
+
+  output = json.dumps(report, indent=2)
+  print(output)
+  if args.output:
+    with open(args.output, "w") as f:
+      f.write(output + "\n")
+
+  if report.get("regressions"):
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
@@ -0,0 +1,66 @@
+"""
+Run app:app in a single process against local stand-ins, for load tests that need no cloud services.
+
+- Valkey: an in-process fakeredis server (with Lua, for the rate limiter), or a
+  real Valkey at VALKEY_HOST with --valkey external
+- SQS: moto's in-process mock, with the FIFO queues created at startup
+- Postgres: the local database at DATABASE_URL (see scripts/db-up.sh)
+
+benchmarks.loadtest starts this automatically; run it directly to point other tools at it.
+
+Usage:
+    ENVIRONMENT=local python -m benchmarks.offline_server --port 5055
+"""
+import argparse
+import os
+
+# Credential limits would reject most of a login storm from one client address; pass RATE_LIMIT_ENABLED=true
+# to include the limiter in a run
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("AWS_REGION", "ap-southeast-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "offline")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "offline")
+
+
+def start_sqs():
+  """Mock SQS in this process and export the queue URLs read by aws.sqs."""
+  import boto3
+  from moto import mock_aws
+
+  mock_aws().start()
+  client = boto3.client("sqs", region_name=os.environ["AWS_REGION"])
+  for env_name, queue in (("AWS_SQS_EMAIL_URL", "account-mgr-email.fifo"), ("AWS_SQS_QUEUE_URL", "account-mgr.fifo")):
+    os.environ[env_name] = client.create_queue(QueueName=queue, Attributes={"FifoQueue": "true"})["QueueUrl"]
+
+
+def start_valkey():
+  """Serve both Valkey pools from an in-process fakeredis server."""
+  from fakeredis import FakeServer
+  from fakeredis.aioredis import FakeConnection
+
+  from db.valkey_client import configure_pools
+
+  configure_pools(FakeConnection, server=FakeServer(), password=None)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=5055)
+  parser.add_argument("--valkey", choices=("fake", "external"), default="fake")
+  args = parser.parse_args()
+
+  # Both must run before the application modules read their configuration or open connections
+  start_sqs()
+  if args.valkey == "fake":
+    start_valkey()
+
+  import uvicorn
+
+  from app import app
+
+  uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+  main()
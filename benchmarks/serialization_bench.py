@@ -0,0 +1,95 @@
+"""
+CPU cost of turning ORM rows into a JSON response body, without a database.
+
+Compares the default path (response_model validation with from_attributes,
+aliased dump, stdlib json) with the FAST_JSON path (pre-built serializer and
+orjson) for lists of 1, 100 and 10,000 rows.
+
+Usage:
+    python -m benchmarks.serialization_bench --budget 200000
+"""
+import argparse
+import datetime
+import json
+import time
+from types import SimpleNamespace
+
+import orjson
+from pydantic import TypeAdapter
+
+from benchmarks.stats import summarize
+from schemas import StaffResponse, StoreResponse
+from serialization import serialize
+
+SIZES = (1, 100, 10_000)
+
+
+def staff_row(i: int):
+  now = datetime.datetime(2025, 3, 1, 12, 0, 0)
+  return SimpleNamespace(
+    id=f"00000000-0000-0000-0000-{i:012d}", u_id=i, email=f"staff{i}@example.com", first_name="First",
+    last_name="Last", display_id=f"U{i}", role="EMPLOYEE", email_confirmed=True, deactivated=False, company_id=1,
+    created_at=now, updated_at=now, confirmed_at=None,
+  )
+
+
+def store_row(i: int):
+  return SimpleNamespace(
+    id=f"00000000-0000-0000-0000-{i:012d}", s_id=i, name=f"Store {i}", alias="ST",
+    company_id="aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa", display_id=f"S{i}",
+  )
+
+
+def validated_path(schema):
+  adapter = TypeAdapter(list[schema])
+
+  def encode(rows) -> bytes:
+    validated = adapter.validate_python(rows, from_attributes=True)
+    return json.dumps(adapter.dump_python(validated, mode="json", by_alias=True)).encode()
+
+  return encode
+
+
+def fast_path(schema):
+  def encode(rows) -> bytes:
+    return orjson.dumps(serialize(schema, rows))
+
+  return encode
+
+
+def measure(encode, rows, budget: int):
+  """Time encode over rows, repeating so every size serializes roughly budget rows in total."""
+  iterations = max(budget // len(rows), 5)
+  encode(rows)  # warm-up
+  samples = []
+  for _ in range(iterations):
+    start = time.perf_counter()
+    encode(rows)
+    samples.append((time.perf_counter() - start) * 1000)
+  return summarize(samples)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--budget", type=int, default=200_000, help="Approximate rows serialized per size and path")
+  args = parser.parse_args()
+
+  results = {}
+  for schema, make_row in ((StaffResponse, staff_row), (StoreResponse, store_row)):
+    validated, fast = validated_path(schema), fast_path(schema)
+    for size in SIZES:
+      rows = [make_row(i) for i in range(size)]
+      assert json.loads(validated(rows)) == json.loads(fast(rows)), f"{schema.__name__} outputs differ"
+      before = measure(validated, rows, args.budget)
+      after = measure(fast, rows, args.budget)
+      results[f"{schema.__name__}[{size}]"] = {
+        "before": before,
+        "after": after,
+        "speedup": round(before["mean_ms"] / after["mean_ms"], 2) if after["mean_ms"] else None,
+      }
+
+  print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,72 @@
+"""
+Latency of session verification per authenticated request against a running Valkey.
+
+Compares the previous two-round-trip lookup of hash-format sessions (GET token,
+then HGETALL session) with the current session_manager.get_current_user.
+
+Usage:
+    ENVIRONMENT=local python -m benchmarks.session_bench --requests 5000 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import redis.asyncio as redis
+
+from benchmarks.legacy_sessions import create_legacy_session, legacy_get_current_user
+from benchmarks.stats import summarize
+from db.valkey_client import raw_redis_pool
+from session_manager import create_session, get_current_user, invalidate_session
+
+
+async def current_get_current_user(valkey: redis.Redis, session_token: str):
+  return await get_current_user(request=None, session_token=session_token, valkey=valkey)
+
+
+async def run(lookup, valkey: redis.Redis, tokens, requests: int, concurrency: int):
+  samples = []
+  counter = iter(range(requests))
+
+  async def worker():
+    for i in counter:
+      token = tokens[i % len(tokens)]
+      start = time.perf_counter()
+      await lookup(valkey, token)
+      samples.append((time.perf_counter() - start) * 1000)
+
+  started = time.perf_counter()
+  await asyncio.gather(*(worker() for _ in range(concurrency)))
+  elapsed = time.perf_counter() - started
+
+  return {**summarize(samples), "throughput_rps": round(requests / elapsed, 1)}
+
+
+async def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--requests", type=int, default=5000)
+  parser.add_argument("--concurrency", type=int, default=20)
+  parser.add_argument("--sessions", type=int, default=100)
+  args = parser.parse_args()
+
+  valkey = redis.Redis(connection_pool=raw_redis_pool)
+  user_data = {"first_name": "Bench", "last_name": "User", "email_confirmed": True}
+  legacy_emails = [f"bench-legacy-{i}@example.com" for i in range(args.sessions)]
+  emails = [f"bench-session-{i}@example.com" for i in range(args.sessions)]
+  legacy_tokens = [await create_legacy_session(valkey, email, str(i), user_data) for i, email in enumerate(legacy_emails)]
+  tokens = [await create_session(valkey, email, str(i), user_data) for i, email in enumerate(emails)]
+
+  try:
+    results = {
+      "before": await run(legacy_get_current_user, valkey, legacy_tokens, args.requests, args.concurrency),
+      "after": await run(current_get_current_user, valkey, tokens, args.requests, args.concurrency),
+    }
+    print(json.dumps(results, indent=2))
+  finally:
+    for email in legacy_emails + emails:
+      await invalidate_session(valkey, email)
+    await valkey.aclose()
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
@@ -0,0 +1,23 @@
+import statistics
+from typing import Dict, List
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+  """Nearest-rank percentile of an already sorted list."""
+  if not sorted_samples:
+    return 0.0
+  index = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+  return sorted_samples[index]
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+  """Summarize latency samples (milliseconds) into the figures reported by every benchmark."""
+  ordered = sorted(samples_ms)
+  return {
+    "count": len(ordered),
+    "mean_ms": round(statistics.fmean(ordered), 4) if ordered else 0.0,
+    "p50_ms": round(percentile(ordered, 50), 4),
+    "p95_ms": round(percentile(ordered, 95), 4),
+    "p99_ms": round(percentile(ordered, 99), 4),
+    "max_ms": round(ordered[-1], 4) if ordered else 0.0,
+  }
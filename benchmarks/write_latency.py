@@ -0,0 +1,113 @@
+"""
+Latency and statement count of single-row writes in the repository layer.
+
+Compares the previous SELECT, mutate, COMMIT, refresh pattern with the
+current single-statement UPDATE ... RETURNING writes. Rows are created for
+the run and deleted afterwards.
+
+Usage:
+    ENVIRONMENT=local CACHE_ENABLED=false python -m benchmarks.write_latency --iterations 500
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from sqlalchemy import delete, event
+from sqlalchemy.future import select
+
+from benchmarks.stats import summarize
+from constants.Role import Role
+from db.database import SessionLocal, engine
+from db.models import CompanyTable, StoreTable, UserTable
+from repository import company as company_crud, store as store_crud
+from schemas import EditCompany, EditStore
+
+statements = 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(*_):
+  global statements
+  statements += 1
+
+
+async def legacy_edit_store(db, store: EditStore):
+  """Baseline: the select-mutate-commit-refresh pattern used before RETURNING-based writes."""
+  result = await db.execute(select(StoreTable).filter(StoreTable.id == store.id))
+  db_store = result.scalars().first()
+  db_store.name = store.name
+  db_store.alias = store.alias
+  await db.commit()
+  await db.refresh(db_store)
+  return db_store
+
+
+async def legacy_edit_company(db, company: EditCompany):
+  result = await db.execute(select(CompanyTable).filter(CompanyTable.id == company.id))
+  db_company = result.scalars().first()
+  db_company.name = company.name
+  db_company.uen = company.uen
+  db_company.email = company.email
+  await db.commit()
+  await db.refresh(db_company)
+  return db_company
+
+
+async def measure(write, make_request, iterations: int):
+  global statements
+  samples = []
+  statements = 0
+  for i in range(iterations):
+    async with SessionLocal(bind=engine) as db:
+      start = time.perf_counter()
+      await write(db, make_request(i))
+      samples.append((time.perf_counter() - start) * 1000)
+  return {**summarize(samples), "statements_per_write": round(statements / iterations, 2)}
+
+
+async def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--iterations", type=int, default=500)
+  args = parser.parse_args()
+
+  user_id, company_id, store_id = (str(uuid.uuid4()) for _ in range(3))
+  async with SessionLocal(bind=engine) as db:
+    db.add(UserTable(id=user_id, email=f"bench-{user_id}@example.com", first_name="Bench", last_name="User",
+                     password="-", role=Role.BUSINESS_OWNER))
+    await db.flush()
+    db.add(CompanyTable(id=company_id, name="Bench", uen="BENCH", email="bench@example.com", user_id=user_id))
+    await db.flush()
+    db.add(StoreTable(id=store_id, name="Bench", alias="B", company_id=company_id))
+    await db.commit()
+
+  def store_request(i):
+    return EditStore(id=store_id, name=f"Bench {i}", alias="B")
+
+  def company_request(i):
+    return EditCompany(id=company_id, name=f"Bench {i}", uen="BENCH", email="bench@example.com")
+
+  try:
+    results = {
+      "edit_store": {
+        "before": await measure(legacy_edit_store, store_request, args.iterations),
+        "after": await measure(store_crud.edit_store, store_request, args.iterations),
+      },
+      "edit_company": {
+        "before": await measure(legacy_edit_company, company_request, args.iterations),
+        "after": await measure(company_crud.edit_company, company_request, args.iterations),
+      },
+    }
+    print(json.dumps(results, indent=2))
+  finally:
+    async with SessionLocal(bind=engine) as db:
+      await db.execute(delete(StoreTable).filter(StoreTable.id == store_id))
+      await db.execute(delete(CompanyTable).filter(CompanyTable.id == company_id))
+      await db.execute(delete(UserTable).filter(UserTable.id == user_id))
+      await db.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
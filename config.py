@@ -4,7 +4,16 @@ import os
 from dotenv import load_dotenv
 
 
+_environment_loaded = False
+
+
 def load_environment():
+  """Load the .env file of the current ENVIRONMENT. Safe to call from every module; the file is read once."""
+  global _environment_loaded
+  if _environment_loaded:
+    return
+  _environment_loaded = True
+
   env = os.getenv("ENVIRONMENT", "prod")
   if env == "prod":
     load_dotenv(".env.production")
@@ -3,14 +3,19 @@ import os
 import ssl
 from datetime import datetime
 
-from sqlalchemy import delete
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import delete, func, make_url, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from config import load_environment, setup_logging
 from constants.Role import Role
-from db.base import Base
+from db.base import Base  # noqa: F401  Re-exported for db.models
 from db.models import RoleTable, UserTable, CompanyTable, StoreTable
+from db.pool import InstrumentedAsyncPool, pool_status
+from metrics import instrument_engine
 
 load_environment()
 setup_logging()
@@ -26,17 +31,43 @@ logger.info(f"🚀 Running in {ENVIRONMENT.upper()} environment")
 if not DATABASE_URL:
   raise ValueError("DATABASE_URL is not set. Check your .env file.")
 
+# Engine configuration
+DB_ECHO = os.getenv("DB_ECHO", "false").lower()  # false, true or debug
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # seconds to wait for a connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # seconds, -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))  # asyncpg, 0 behind pgbouncer
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", 100))
+
+# Production applies migrations as a release step (alembic upgrade head) instead of in every worker
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", str(ENVIRONMENT != "prod")).lower() == "true"
+STARTUP_LOCK_ID = 5005  # pg advisory lock key serializing startup migrations across workers
+
 # Configure SSL context for production database (only if needed)
 ssl_context = ssl.create_default_context() if ENVIRONMENT == "prod" else None
 
+connect_args = {"ssl": ssl_context} if ssl_context else {}
+if make_url(DATABASE_URL).get_driver_name() == "asyncpg":
+  connect_args["statement_cache_size"] = DB_STATEMENT_CACHE_SIZE
+  connect_args["prepared_statement_cache_size"] = DB_PREPARED_STATEMENT_CACHE_SIZE
+
 # Create async engine
 engine = create_async_engine(
   DATABASE_URL,
-  echo=True,
-  pool_pre_ping=True,
-  connect_args={"ssl": ssl_context} if ssl_context else {}
+  echo="debug" if DB_ECHO == "debug" else DB_ECHO == "true",
+  poolclass=InstrumentedAsyncPool,
+  pool_size=DB_POOL_SIZE,
+  max_overflow=DB_MAX_OVERFLOW,
+  pool_timeout=DB_POOL_TIMEOUT,
+  pool_recycle=DB_POOL_RECYCLE,
+  pool_pre_ping=DB_POOL_PRE_PING,
+  connect_args=connect_args
 )
 
+instrument_engine(engine)
+
 SessionLocal = sessionmaker(
   autocommit=False,
   autoflush=False,
@@ -45,28 +76,43 @@ SessionLocal = sessionmaker(
 )
 
 
-# Function to create tables asynchronously
-async def create_tables():
+ALEMBIC_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def _upgrade(connection):
+  alembic_config = Config(ALEMBIC_CONFIG)
+  alembic_config.attributes["connection"] = connection
+  command.upgrade(alembic_config, "head")
+
+
+# Bring the schema up to date. Callers starting together (workers, containers of a rolling deploy) take turns
+# on an advisory lock, so only the first one runs pending migrations.
+async def migrate():
   async with engine.begin() as conn:
-    await conn.run_sync(Base.metadata.create_all)
+    await conn.execute(select(func.pg_advisory_xact_lock(STARTUP_LOCK_ID)))
+    await conn.run_sync(_upgrade)
 
 
-# Run table creation when the application starts
+# Migrate when the application starts, unless migrations run as a release step (scripts/migrate.py)
 async def init_db():
-  await create_tables()
+  if not DB_MIGRATE_ON_STARTUP:
+    logger.info("Skipping schema migrations on startup (DB_MIGRATE_ON_STARTUP=false)")
+    return
+  await migrate()
 
 
-# Insert static values
+# Insert static values. Existing roles are left untouched, so every worker can run this on startup.
 async def insert_static():
   async with SessionLocal(bind=engine) as session:
     try:
-      records = [
-        RoleTable(key=Role.ADMINISTRATOR, value='Administrator', hierarchy=0),
-        RoleTable(key=Role.BUSINESS_OWNER, value='Business Owner', hierarchy=10),
-        RoleTable(key=Role.EMPLOYEE, value='Employee', hierarchy=11),
-        RoleTable(key=Role.CUSTOMER, value='Customer', hierarchy=99),
-      ]
-      session.add_all(records)
+      await session.execute(
+        pg_insert(RoleTable).values([
+          {"key": Role.ADMINISTRATOR, "value": "Administrator", "hierarchy": 0},
+          {"key": Role.BUSINESS_OWNER, "value": "Business Owner", "hierarchy": 10},
+          {"key": Role.EMPLOYEE, "value": "Employee", "hierarchy": 11},
+          {"key": Role.CUSTOMER, "value": "Customer", "hierarchy": 99},
+        ]).on_conflict_do_nothing(index_elements=[RoleTable.key])
+      )
       await session.commit()
     except Exception as e:
       await session.rollback()
@@ -249,6 +295,11 @@ async def insert_test_data():
   logger.info("Test data insertion complete")
 
 
+def db_pool_status():
+  """Connection pool occupancy and checkout wait times for this worker."""
+  return pool_status(engine.pool)
+
+
 # Dependency for async DB session
 async def get_db():
   async with SessionLocal(bind=engine) as session:
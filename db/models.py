@@ -1,7 +1,7 @@
 import datetime
 import uuid
 
-from sqlalchemy import Column, String, ForeignKey, Integer, Sequence, Boolean, DateTime
+from sqlalchemy import Column, String, ForeignKey, Integer, Sequence, Boolean, DateTime, Index, func, text
 from sqlalchemy.ext.hybrid import hybrid_property
 
 from db.database import Base
@@ -17,6 +17,10 @@ class RoleTable(Base):
 
 class UserTable(Base):
   __tablename__ = "users"
+  __table_args__ = (
+    # Staff lists per company, ordered by u_id for keyset pagination
+    Index("ix_users_company_id_u_id", "company_id", "u_id"),
+  )
 
   id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
   u_id = Column(Integer, Sequence('user_u_id_seq'), index=True, autoincrement=True, nullable=False)
@@ -28,8 +32,8 @@ class UserTable(Base):
   role = Column(String, ForeignKey("roles.key", ondelete="CASCADE"), nullable=False)
   company_id = Column(Integer, ForeignKey("companies.c_id", ondelete="CASCADE"), nullable=True)
   deactivated = Column(Boolean, default=False)
-  created_at = Column(DateTime, default=datetime.datetime.now(), nullable=False)
-  updated_at = Column(DateTime, default=datetime.datetime.now(), nullable=False)
+  created_at = Column(DateTime, default=datetime.datetime.now, nullable=False)
+  updated_at = Column(DateTime, default=datetime.datetime.now, nullable=False)
   confirmed_at = Column(DateTime, default=None, nullable=True)
 
   @hybrid_property
@@ -39,6 +43,10 @@ class UserTable(Base):
 
 class CompanyTable(Base):
   __tablename__ = "companies"
+  __table_args__ = (
+    # Active companies per owner, ordered by c_id for keyset pagination
+    Index("ix_companies_user_id_c_id_active", "user_id", "c_id", postgresql_where=text("deactivated = false")),
+  )
 
   id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
   c_id = Column(Integer, Sequence('company_c_id_seq'), index=True, unique=True, autoincrement=True, nullable=False)
@@ -46,7 +54,10 @@ class CompanyTable(Base):
   uen = Column(String, nullable=False)
   email = Column(String, nullable=False)
   deactivated = Column(Boolean, default=False)
-  user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+  user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+  # Incremented by every write; the ETag of the company is derived from it
+  version = Column(Integer, default=1, server_default=text("1"), nullable=False)
+  updated_at = Column(DateTime, default=datetime.datetime.now, server_default=func.now(), nullable=False)
 
   @hybrid_property
   def display_id(self):
@@ -55,13 +66,20 @@ class CompanyTable(Base):
 
 class StoreTable(Base):
   __tablename__ = "stores"
+  __table_args__ = (
+    # Active stores per company, ordered by s_id for keyset pagination
+    Index("ix_stores_company_id_s_id_active", "company_id", "s_id", postgresql_where=text("deactivated = false")),
+  )
 
   id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
   s_id = Column(Integer, Sequence('store_s_id_seq'), index=True, unique=True, autoincrement=True, nullable=False)
   name = Column(String, nullable=False)
   alias = Column(String, nullable=True)
   deactivated = Column(Boolean, default=False)
-  company_id = Column(String, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+  company_id = Column(String, ForeignKey("companies.id", ondelete="CASCADE"), index=True, nullable=False)
+  # Incremented by every write; the ETag of the store is derived from it
+  version = Column(Integer, default=1, server_default=text("1"), nullable=False)
+  updated_at = Column(DateTime, default=datetime.datetime.now, server_default=func.now(), nullable=False)
 
   @hybrid_property
   def display_id(self):
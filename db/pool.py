@@ -0,0 +1,51 @@
+import time
+from typing import Any, Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolStats:
+  """Connection checkout counters for this worker."""
+
+  def __init__(self):
+    self.checkouts = 0
+    self.timeouts = 0
+    self.wait_ms_total = 0.0
+    self.wait_ms_max = 0.0
+
+  def record_wait(self, wait_ms: float):
+    self.checkouts += 1
+    self.wait_ms_total += wait_ms
+    self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+  """Queue pool that records how long each checkout waited for a connection."""
+
+  def _do_get(self):
+    start = time.perf_counter()
+    try:
+      connection = super()._do_get()
+    except PoolTimeoutError:
+      pool_stats.timeouts += 1
+      raise
+    pool_stats.record_wait((time.perf_counter() - start) * 1000)
+    return connection
+
+
+def pool_status(pool) -> Dict[str, Any]:
+  """Current pool occupancy together with the accumulated checkout counters."""
+  return {
+    "size": pool.size(),
+    "checked_out": pool.checkedout(),
+    "checked_in": pool.checkedin(),
+    "overflow": pool.overflow(),
+    "checkouts": pool_stats.checkouts,
+    "timeouts": pool_stats.timeouts,
+    "avg_wait_ms": round(pool_stats.wait_ms_total / pool_stats.checkouts, 3) if pool_stats.checkouts else 0.0,
+    "max_wait_ms": round(pool_stats.wait_ms_max, 3),
+  }
@@ -1,17 +1,16 @@
 import os
+import time
+from typing import Callable, List
 
 import redis.asyncio as redis
-from dotenv import load_dotenv
+from redis.asyncio.client import Pipeline
 
-# Use the same environment loading logic as in database.py
-ENVIRONMENT = os.getenv("ENVIRONMENT", "prod")
+from config import load_environment
+from metrics import VALKEY_COMMAND_DURATION
+
+load_environment()
 
-if ENVIRONMENT == "prod":
-  load_dotenv(".env.production")
-elif ENVIRONMENT == "local":
-  load_dotenv(".env.local")
-else:
-  load_dotenv(".env")
+ENVIRONMENT = os.getenv("ENVIRONMENT", "prod")
 
 # Configure Valkey connection parameters
 VALKEY_HOST = os.getenv("VALKEY_HOST", "localhost")  # Use container name in Docker network
@@ -19,30 +18,81 @@ VALKEY_PORT = os.getenv("VALKEY_PORT", 6379)
 VALKEY_PASSWORD = os.getenv("VALKEY_PASSWORD", "magical_password")
 VALKEY_DB = os.getenv("VALKEY_DB", 0)
 
-# Create Redis connection pool differently based on environment
+# Create Redis connection pool differently based on environment. Pools only connect on first use.
+pool_kwargs = {
+  "host": VALKEY_HOST,
+  "port": int(VALKEY_PORT),
+  "db": int(VALKEY_DB),
+}
 if ENVIRONMENT == "local":
-    redis_pool = redis.ConnectionPool(
-        host=VALKEY_HOST,
-        port=int(VALKEY_PORT),
-        password=VALKEY_PASSWORD,
-        db=int(VALKEY_DB),
-        decode_responses=True
-    )
-else:  # prod or others
-    redis_pool = redis.ConnectionPool(
-        host=VALKEY_HOST,
-        port=int(VALKEY_PORT),
-        db=int(VALKEY_DB),
-        decode_responses=True
-    )
-
-# Create a Redis client using the connection pool
+  pool_kwargs["password"] = VALKEY_PASSWORD
+
+redis_pool = redis.ConnectionPool(**pool_kwargs, decode_responses=True)
+
+# Binary-safe pool for values that are not UTF-8 text, such as msgpack-encoded sessions
+raw_redis_pool = redis.ConnectionPool(**pool_kwargs, decode_responses=False)
+
+
+def configure_pools(connection_class, **connection_kwargs):
+  """Point both pools at another connection class, such as an in-process stand-in. Call before the first command."""
+  for pool in (redis_pool, raw_redis_pool):
+    pool.connection_class = connection_class
+    pool.connection_kwargs.update(connection_kwargs)
+
+
+# Extra observers of (command, seconds) for every timed command, e.g. the request profiler. Empty unless enabled.
+command_hooks: List[Callable[[str, float], None]] = []
+
+
+def _observe(command: str, start: float):
+  elapsed = time.perf_counter() - start
+  VALKEY_COMMAND_DURATION.labels(command).observe(elapsed)
+  for hook in command_hooks:
+    hook(command, elapsed)
+
+
+class InstrumentedPipeline(Pipeline):
+  """Pipeline timing each execute as a single round trip."""
+
+  async def execute(self, raise_on_error: bool = True):
+    start = time.perf_counter()
+    try:
+      return await super().execute(raise_on_error)
+    finally:
+      _observe("MULTI" if self.is_transaction else "PIPELINE", start)
+
+
+class InstrumentedRedis(redis.Redis):
+  """Redis client recording the latency of every command, script call and pipeline."""
+
+  async def execute_command(self, *args, **options):
+    start = time.perf_counter()
+    try:
+      return await super().execute_command(*args, **options)
+    finally:
+      _observe(str(args[0]).upper(), start)
+
+  def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+    return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+# Create a Redis client using the connection pool.
+# The pool is shared, so closing the client must only release its connection, not disconnect the pool.
 async def get_valkey():
-  client = redis.Redis.from_pool(redis_pool)
+  client = InstrumentedRedis(connection_pool=redis_pool)
+  try:
+    yield client
+  finally:
+    await client.aclose()
+
+
+# Same as get_valkey, but responses are returned as bytes
+async def get_valkey_raw():
+  client = InstrumentedRedis(connection_pool=raw_redis_pool)
   try:
     yield client
   finally:
-    await client.close()
+    await client.aclose()
 
 
 # Utility functions for common operations
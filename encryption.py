@@ -1,16 +1,54 @@
+import asyncio
+import logging
+import multiprocessing
+import os
 import random
 import string
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, List, Optional
 
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from config import load_environment
+from metrics import BCRYPT_DURATION, BCRYPT_PENDING
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+# Target bcrypt cost. Pinning min/max to the target makes needs_update() flag hashes of any other cost.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+
+pwd_context = CryptContext(
+  schemes=["bcrypt"],
+  deprecated="auto",
+  bcrypt__default_rounds=BCRYPT_ROUNDS,
+  bcrypt__min_rounds=BCRYPT_ROUNDS,
+  bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# Hashing pool configuration. BCRYPT_POOL_SIZE=0 falls back to the loop's default thread pool.
+# Every uvicorn worker starts its own pool, so by default the cores are shared out between the WEB_CONCURRENCY workers
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", 1)), 1)
+BCRYPT_POOL_SIZE = int(os.getenv("BCRYPT_POOL_SIZE", max((os.cpu_count() or 1) // WEB_CONCURRENCY, 1)))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", BCRYPT_POOL_SIZE * 8 or 32))
+BCRYPT_SLOW_MS = float(os.getenv("BCRYPT_SLOW_MS", 1000))
+BCRYPT_BULK_CHUNK = int(os.getenv("BCRYPT_BULK_CHUNK", 16))  # passwords hashed per pool job in bulk hashing
+
+_executor: Optional[Executor] = None
+_pending = 0
+
+
+class HashingPoolBusy(Exception):
+  """Raised when too many hashing jobs are already queued on this worker."""
 
 
 def verify_password(plain_password, hashed_password):
   try:
     return pwd_context.verify(plain_password, hashed_password)
   except Exception as e:
-    print(f"Password verification error: {str(e)}")
+    logger.error(f"Password verification error: {str(e)}")
     return False
 
 
@@ -18,6 +56,127 @@ def get_password_hash(password):
   return pwd_context.hash(password)
 
 
+def get_password_hashes(passwords):
+  return [pwd_context.hash(password) for password in passwords]
+
+
+def needs_rehash(hashed_password) -> bool:
+  """Check whether a stored hash was produced with a cost other than BCRYPT_ROUNDS."""
+  try:
+    return pwd_context.needs_update(hashed_password)
+  except Exception as e:
+    logger.error(f"Unable to inspect password hash: {str(e)}")
+    return False
+
+
+def calibrate_rounds(budget_ms: float, min_rounds: int = 4, max_rounds: int = 16, samples: int = 3):
+  """
+  Measure bcrypt on this host and pick the highest cost that fits a latency budget.
+
+  Args:
+      budget_ms: Maximum acceptable time for a single hash in milliseconds
+      min_rounds: Lowest cost to consider
+      max_rounds: Highest cost to consider
+      samples: Hashes timed per cost; the median is used
+
+  Returns:
+      (recommended rounds, {rounds: median ms})
+  """
+  timings = {}
+  recommended = min_rounds
+  for rounds in range(min_rounds, max_rounds + 1):
+    context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds)
+    durations = []
+    for _ in range(samples):
+      start = time.perf_counter()
+      context.hash(generate_random_password())
+      durations.append((time.perf_counter() - start) * 1000)
+    timings[rounds] = sorted(durations)[len(durations) // 2]
+
+    if timings[rounds] > budget_ms:
+      break
+    recommended = rounds
+
+  return recommended, timings
+
+
+def _get_executor() -> Optional[Executor]:
+  """Lazily create the process pool used for bcrypt work."""
+  global _executor
+  if _executor is None and BCRYPT_POOL_SIZE > 0:
+    # spawn avoids inheriting the event loop and open sockets of the uvicorn worker
+    _executor = ProcessPoolExecutor(max_workers=BCRYPT_POOL_SIZE, mp_context=multiprocessing.get_context("spawn"))
+  return _executor
+
+
+def shutdown_hashing_pool():
+  """Stop the bcrypt process pool. Called from the application lifespan."""
+  global _executor
+  if _executor is not None:
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+async def _run_in_pool(operation: str, func, *args):
+  global _pending
+  if _pending >= BCRYPT_MAX_PENDING:
+    raise HashingPoolBusy(f"{_pending} hashing jobs already pending")
+
+  _pending += 1
+  BCRYPT_PENDING.inc()
+  start = time.perf_counter()
+  try:
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+  finally:
+    _pending -= 1
+    BCRYPT_PENDING.dec()
+    BCRYPT_DURATION.labels(operation).observe(time.perf_counter() - start)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    log = logger.warning if elapsed_ms >= BCRYPT_SLOW_MS else logger.debug
+    log(f"bcrypt {operation} took {elapsed_ms:.1f} ms ({_pending} pending)")
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+  """Verify a password without blocking the event loop."""
+  return await _run_in_pool("verify", verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password) -> str:
+  """Hash a password without blocking the event loop."""
+  return await _run_in_pool("hash", get_password_hash, password)
+
+
+async def hash_passwords_async(passwords, on_progress: Optional[Callable[[int], None]] = None) -> List[str]:
+  """
+  Hash many passwords in parallel across the pool.
+
+  Passwords are sent in chunks of BCRYPT_BULK_CHUNK, with at most one chunk per
+  pool process in flight, so single logins still get a slot between chunks.
+
+  Args:
+      passwords: Plain passwords
+      on_progress: Called with the number of passwords hashed so far after each chunk
+
+  Returns:
+      Hashes in the same order as passwords
+  """
+  chunks = [passwords[i:i + BCRYPT_BULK_CHUNK] for i in range(0, len(passwords), BCRYPT_BULK_CHUNK)]
+  results: List[Optional[List[str]]] = [None] * len(chunks)
+  slots = asyncio.Semaphore(max(BCRYPT_POOL_SIZE, 1))
+  done = 0
+
+  async def hash_chunk(index: int):
+    nonlocal done
+    async with slots:
+      results[index] = await _run_in_pool("bulk hash", get_password_hashes, chunks[index])
+    done += len(chunks[index])
+    if on_progress is not None:
+      on_progress(done)
+
+  await asyncio.gather(*(hash_chunk(index) for index in range(len(chunks))))
+  return [hashed for chunk in results for hashed in chunk]
+
+
 def generate_random_password(length=12):
   """
   Generate a random password with letters, numbers, and symbols.
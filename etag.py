@@ -0,0 +1,32 @@
+import hashlib
+from typing import Iterable, Optional
+
+from fastapi import Response
+
+
+def row_etag(kind: str, id: str, version: int) -> str:
+  """Strong ETag of a single versioned row."""
+  return f'"{kind}-{id}-{version}"'
+
+
+def list_etag(kind: str, rows: Iterable, *extra) -> str:
+  """Strong ETag of a list of versioned rows, changing whenever a row is added, removed or written."""
+  digest = hashlib.blake2b(digest_size=16)
+  for part in extra:
+    digest.update(f"{part};".encode())
+  for row in rows:
+    digest.update(f"{row.id}:{row.version};".encode())
+  return f'"{kind}-{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+  """Evaluate If-None-Match, which uses weak comparison, against the current ETag."""
+  if not if_none_match:
+    return False
+  if if_none_match.strip() == "*":
+    return True
+  return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+  return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+import logging
+import os
+from typing import AsyncIterator, Awaitable, Callable
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import load_environment
+from db.database import SessionLocal, engine
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the server-side cursor and written to the response per chunk
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 1000))
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+Fetch = Callable[[AsyncSession, int], Awaitable]
+
+
+def export_response(fetch: Fetch, schema: type[BaseModel], fmt: str, filename: str) -> StreamingResponse:
+  """
+  Stream the rows returned by fetch as NDJSON or CSV.
+
+  Args:
+      fetch: Repository function taking (db, chunk_size) and returning a streamed scalar result
+      schema: Response model each row is dumped with, so exports match the JSON API
+      fmt: "ndjson" or "csv"
+      filename: Download name without extension
+  """
+  return StreamingResponse(
+    _export(fetch, schema, fmt),
+    media_type=MEDIA_TYPES[fmt],
+    headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+  )
+
+
+async def _export(fetch: Fetch, schema: type[BaseModel], fmt: str) -> AsyncIterator[str]:
+  # Request dependencies are closed before a streamed body is sent, so the export opens its own session
+  async with SessionLocal(bind=engine) as db:
+    result = await fetch(db, EXPORT_CHUNK_SIZE)
+    fields = [field.alias or name for name, field in schema.model_fields.items()]
+    rows = 0
+
+    if fmt == "csv":
+      yield _csv_lines([fields])
+
+    async for partition in result.partitions():
+      records = [schema.model_validate(row).model_dump(mode="json", by_alias=True) for row in partition]
+      rows += len(records)
+      if fmt == "csv":
+        yield _csv_lines([[record[field] for field in fields] for record in records])
+      else:
+        yield "".join(json.dumps(record) + "\n" for record in records)
+
+    logger.debug(f"Exported {rows} {schema.__name__} rows as {fmt}")
+
+
+def _csv_lines(rows) -> str:
+  buffer = io.StringIO()
+  csv.writer(buffer).writerows(rows)
+  return buffer.getvalue()
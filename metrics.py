@@ -0,0 +1,127 @@
+import os
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import load_environment
+
+load_environment()
+
+# With several uvicorn workers, each process writes its samples to this directory and /metrics aggregates them.
+# The directory must be emptied before the workers start.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if PROMETHEUS_MULTIPROC_DIR:
+  os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+# prometheus_client picks its storage from PROMETHEUS_MULTIPROC_DIR on import, so it is imported after the .env load
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Gauge, Histogram, generate_latest, \
+  multiprocess  # noqa: E402
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BCRYPT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+REQUEST_DURATION = Histogram(
+  "http_request_duration_seconds", "HTTP request latency by route template",
+  ["method", "route", "status"], buckets=REQUEST_BUCKETS,
+)
+DB_STATEMENT_DURATION = Histogram(
+  "db_statement_duration_seconds", "Database statement execution time",
+  ["operation"], buckets=FAST_BUCKETS,
+)
+VALKEY_COMMAND_DURATION = Histogram(
+  "valkey_command_duration_seconds", "Valkey command and pipeline round-trip time",
+  ["command"], buckets=FAST_BUCKETS,
+)
+SQS_PUBLISH_DURATION = Histogram(
+  "sqs_publish_duration_seconds", "Time from send_message until SQS accepted or rejected the message",
+  ["path", "outcome"], buckets=REQUEST_BUCKETS,
+)
+SQS_BATCH_DURATION = Histogram(
+  "sqs_batch_duration_seconds", "SendMessageBatch call time",
+  ["outcome"], buckets=REQUEST_BUCKETS,
+)
+BCRYPT_DURATION = Histogram(
+  "bcrypt_duration_seconds", "bcrypt hash and verify time including the wait for a pool process",
+  ["operation"], buckets=BCRYPT_BUCKETS,
+)
+BCRYPT_PENDING = Gauge(
+  "bcrypt_pending_jobs", "Hashing jobs submitted and not yet finished", multiprocess_mode="livesum",
+)
+
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "WITH"}
+
+
+def sql_operation(statement: str) -> str:
+  """Leading SQL keyword of a statement, keeping the label set small."""
+  keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+  return keyword if keyword in _SQL_OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine):
+  """Time every statement the engine executes."""
+  from sqlalchemy import event
+
+  sync_engine = getattr(engine, "sync_engine", engine)
+
+  @event.listens_for(sync_engine, "before_cursor_execute")
+  def _start(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+  @event.listens_for(sync_engine, "after_cursor_execute")
+  def _stop(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_query_start"].pop()
+    DB_STATEMENT_DURATION.labels(sql_operation(statement)).observe(time.perf_counter() - started)
+
+  @event.listens_for(sync_engine, "handle_error")
+  def _failed(exception_context):
+    # after_cursor_execute is skipped for failed statements, so drop their start time
+    starts = exception_context.connection.info.get("metrics_query_start") if exception_context.connection else None
+    if starts:
+      starts.pop()
+
+
+def render_metrics() -> tuple[bytes, str]:
+  """Exposition of this process, or of all workers when PROMETHEUS_MULTIPROC_DIR is set."""
+  if PROMETHEUS_MULTIPROC_DIR:
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+  return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_worker_exited():
+  """Drop this worker's live gauges from the aggregated view when it shuts down."""
+  if PROMETHEUS_MULTIPROC_DIR:
+    multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+  """ASGI middleware recording request latency labelled with the matched route template, not the raw path."""
+
+  def __init__(self, app: ASGIApp):
+    self.app = app
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send):
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    status: Optional[int] = None
+    start = time.perf_counter()
+
+    async def send_wrapper(message: Message):
+      nonlocal status
+      if message["type"] == "http.response.start":
+        status = message["status"]
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      # FastAPI stores the matched route in the scope while routing
+      route = scope.get("route")
+      REQUEST_DURATION.labels(
+        scope["method"], getattr(route, "path", "unmatched"), str(status or 500)
+      ).observe(time.perf_counter() - start)
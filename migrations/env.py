@@ -0,0 +1,43 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+
+from db.base import Base
+from db.database import DATABASE_URL, engine  # Also registers the tables on Base.metadata
+
+config = context.config
+
+# Keep the application's logging when migrations run from init_db
+if config.config_file_name is not None and "connection" not in config.attributes:
+  fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+  """Emit the migration SQL without connecting (alembic upgrade --sql)."""
+  context.configure(url=DATABASE_URL, target_metadata=target_metadata, literal_binds=True)
+  with context.begin_transaction():
+    context.run_migrations()
+
+
+def run_migrations(connection):
+  context.configure(connection=connection, target_metadata=target_metadata)
+  with context.begin_transaction():
+    context.run_migrations()
+
+
+async def run_async_migrations():
+  async with engine.connect() as connection:
+    await connection.run_sync(run_migrations)
+  await engine.dispose()
+
+
+if context.is_offline_mode():
+  run_migrations_offline()
+elif "connection" in config.attributes:
+  # Called from db.database.init_db with a connection that is already open
+  run_migrations(config.attributes["connection"])
+else:
+  asyncio.run(run_async_migrations())
@@ -0,0 +1,92 @@
+"""Initial schema
+
+Databases created before migrations were introduced already have these tables
+from Base.metadata.create_all, so the revision only creates what is missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-03-01 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+  if sa.inspect(op.get_bind()).has_table("users"):
+    return
+
+  op.execute(sa.schema.CreateSequence(sa.Sequence("user_u_id_seq")))
+  op.execute(sa.schema.CreateSequence(sa.Sequence("company_c_id_seq")))
+  op.execute(sa.schema.CreateSequence(sa.Sequence("store_s_id_seq")))
+
+  op.create_table(
+    "roles",
+    sa.Column("key", sa.String(100), primary_key=True, nullable=False),
+    sa.Column("value", sa.String(100), nullable=False),
+    sa.Column("hierarchy", sa.Integer(), nullable=False),
+  )
+  op.create_index("ix_roles_key", "roles", ["key"])
+
+  # users.company_id references companies, which references users; the FK is added once both exist
+  op.create_table(
+    "users",
+    sa.Column("id", sa.String(), primary_key=True, nullable=False),
+    sa.Column("u_id", sa.Integer(), nullable=False),
+    sa.Column("email", sa.String(), nullable=False),
+    sa.Column("first_name", sa.String(), nullable=False),
+    sa.Column("last_name", sa.String(), nullable=False),
+    sa.Column("password", sa.String(), nullable=False),
+    sa.Column("email_confirmed", sa.Boolean(), nullable=True),
+    sa.Column("role", sa.String(), sa.ForeignKey("roles.key", ondelete="CASCADE"), nullable=False),
+    sa.Column("company_id", sa.Integer(), nullable=True),
+    sa.Column("deactivated", sa.Boolean(), nullable=True),
+    sa.Column("created_at", sa.DateTime(), nullable=False),
+    sa.Column("updated_at", sa.DateTime(), nullable=False),
+    sa.Column("confirmed_at", sa.DateTime(), nullable=True),
+  )
+  op.create_index("ix_users_id", "users", ["id"])
+  op.create_index("ix_users_u_id", "users", ["u_id"])
+  op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+  op.create_table(
+    "companies",
+    sa.Column("id", sa.String(), primary_key=True, nullable=False),
+    sa.Column("c_id", sa.Integer(), nullable=False),
+    sa.Column("name", sa.String(), nullable=False),
+    sa.Column("uen", sa.String(), nullable=False),
+    sa.Column("email", sa.String(), nullable=False),
+    sa.Column("deactivated", sa.Boolean(), nullable=True),
+    sa.Column("user_id", sa.String(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+  )
+  op.create_index("ix_companies_id", "companies", ["id"])
+  op.create_index("ix_companies_c_id", "companies", ["c_id"], unique=True)
+
+  op.create_table(
+    "stores",
+    sa.Column("id", sa.String(), primary_key=True, nullable=False),
+    sa.Column("s_id", sa.Integer(), nullable=False),
+    sa.Column("name", sa.String(), nullable=False),
+    sa.Column("alias", sa.String(), nullable=True),
+    sa.Column("deactivated", sa.Boolean(), nullable=True),
+    sa.Column("company_id", sa.String(), sa.ForeignKey("companies.id", ondelete="CASCADE"), nullable=False),
+  )
+  op.create_index("ix_stores_id", "stores", ["id"])
+  op.create_index("ix_stores_s_id", "stores", ["s_id"], unique=True)
+
+  op.create_foreign_key("users_company_id_fkey", "users", "companies", ["company_id"], ["c_id"], ondelete="CASCADE")
+
+
+def downgrade():
+  op.drop_constraint("users_company_id_fkey", "users", type_="foreignkey")
+  op.drop_table("stores")
+  op.drop_table("companies")
+  op.drop_table("users")
+  op.drop_table("roles")
+  op.execute(sa.schema.DropSequence(sa.Sequence("store_s_id_seq")))
+  op.execute(sa.schema.DropSequence(sa.Sequence("company_c_id_seq")))
+  op.execute(sa.schema.DropSequence(sa.Sequence("user_u_id_seq")))
@@ -0,0 +1,39 @@
+"""Index the foreign keys used as filters on hot paths
+
+Plain indexes on the foreign keys serve joins and cascades. The composite
+indexes match the list queries, which filter by owner, skip deactivated rows
+and page in sequence order.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-03-01 00:00:01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("deactivated = false")
+
+
+def upgrade():
+  op.create_index("ix_users_company_id_u_id", "users", ["company_id", "u_id"], if_not_exists=True)
+  op.create_index("ix_companies_user_id", "companies", ["user_id"], if_not_exists=True)
+  op.create_index(
+    "ix_companies_user_id_c_id_active", "companies", ["user_id", "c_id"], postgresql_where=ACTIVE, if_not_exists=True
+  )
+  op.create_index("ix_stores_company_id", "stores", ["company_id"], if_not_exists=True)
+  op.create_index(
+    "ix_stores_company_id_s_id_active", "stores", ["company_id", "s_id"], postgresql_where=ACTIVE, if_not_exists=True
+  )
+
+
+def downgrade():
+  op.drop_index("ix_stores_company_id_s_id_active", table_name="stores", if_exists=True)
+  op.drop_index("ix_stores_company_id", table_name="stores", if_exists=True)
+  op.drop_index("ix_companies_user_id_c_id_active", table_name="companies", if_exists=True)
+  op.drop_index("ix_companies_user_id", table_name="companies", if_exists=True)
+  op.drop_index("ix_users_company_id_u_id", table_name="users", if_exists=True)
@@ -0,0 +1,25 @@
+"""Add version and updated_at to companies and stores
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-03-08 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+  for table in ("companies", "stores"):
+    op.add_column(table, sa.Column("version", sa.Integer(), server_default=sa.text("1"), nullable=False))
+    op.add_column(table, sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now(), nullable=False))
+
+
+def downgrade():
+  for table in ("stores", "companies"):
+    op.drop_column(table, "updated_at")
+    op.drop_column(table, "version")
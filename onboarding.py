@@ -0,0 +1,187 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import schemas
+from aws.sqs import send_message
+from config import load_environment
+from constants.Role import Role
+from db.database import SessionLocal, engine
+from encryption import HashingPoolBusy, generate_random_password, hash_passwords_async
+from repository import account as crud
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", 5000))
+
+# Per-row outcomes
+CREATED = "created"
+EXISTS = "exists"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+class BulkInputError(Exception):
+  """Raised when an upload cannot be read as a list of staff."""
+
+
+def parse_staff_rows(body: bytes, content_type: str) -> List[Any]:
+  """Read a JSON array or a CSV file with an email,first_name,last_name header into raw rows."""
+  try:
+    text = body.decode("utf-8-sig")
+  except UnicodeDecodeError:
+    raise BulkInputError("Upload must be UTF-8 encoded")
+
+  if "csv" in content_type:
+    rows = list(csv.DictReader(io.StringIO(text)))
+  else:
+    try:
+      rows = json.loads(text)
+    except ValueError:
+      raise BulkInputError("Body is neither a JSON array nor CSV")
+    if not isinstance(rows, list):
+      raise BulkInputError("Expected a JSON array of staff")
+
+  if len(rows) > BULK_MAX_ROWS:
+    raise BulkInputError(f"At most {BULK_MAX_ROWS} staff can be registered per upload")
+  return rows
+
+
+async def onboard_staff(db: AsyncSession, c_id: int, rows: List[Any],
+                        on_progress: Optional[ProgressCallback] = None) -> List[Dict[str, Any]]:
+  """
+  Register employees of a company in bulk.
+
+  Validates every row, checks all emails against existing users in one query,
+  hashes the generated passwords in parallel, inserts the new users with
+  multi-row INSERTs and publishes the registration events through the SQS
+  publisher, which sends them in batches.
+
+  Args:
+      db: Database session
+      c_id: Company the employees belong to
+      rows: Raw rows as returned by parse_staff_rows
+      on_progress: Called with a progress event after each stage
+
+  Returns:
+      One result per input row, in input order
+  """
+  report = on_progress or (lambda event: None)
+  results: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+  staff: Dict[str, tuple] = {}
+
+  for index, row in enumerate(rows):
+    try:
+      member = schemas.BulkStaff.model_validate(row)
+    except ValidationError as e:
+      results[index] = {"row": index, "status": INVALID, "detail": _validation_detail(e)}
+      continue
+    if member.email in staff:
+      results[index] = {"row": index, "email": member.email, "status": DUPLICATE}
+      continue
+    staff[member.email] = (index, member)
+
+  existing = await crud.get_existing_emails(db, list(staff))
+  pending = []
+  for email, (index, member) in staff.items():
+    if email in existing:
+      results[index] = {"row": index, "email": email, "status": EXISTS}
+    else:
+      pending.append((index, member))
+  report({"stage": "validated", "rows": len(rows), "new": len(pending)})
+
+  passwords = [generate_random_password() for _ in pending]
+  hashes = await hash_passwords_async(
+    passwords, lambda done: report({"stage": "hashing", "done": done, "total": len(pending)})
+  )
+
+  db_users = await crud.create_users(db, [
+    {"email": member.email, "first_name": member.first_name, "last_name": member.last_name, "password": hashed}
+    for (_, member), hashed in zip(pending, hashes)
+  ], Role.EMPLOYEE, c_id)
+  created = {user.email: user for user in db_users}
+  report({"stage": "inserted", "created": len(created)})
+
+  new_staff = [(index, member, password) for (index, member), password in zip(pending, passwords)
+               if member.email in created]
+  delivered = await asyncio.gather(*(
+    send_message(json.dumps({
+      "first_name": member.first_name,
+      "last_name": member.last_name,
+      "email": member.email,
+      "password": password,
+      "role": Role.EMPLOYEE,
+    }), "register-user-event", "register")
+    for _, member, password in new_staff
+  ))
+  report({"stage": "notified", "sent": sum(delivered)})
+
+  for (index, member, _), sent in zip(new_staff, delivered):
+    user = created[member.email]
+    results[index] = {"row": index, "email": user.email, "status": CREATED, "id": user.id, "notified": sent}
+
+  # Taken by a concurrent registration between the duplicate check and the insert
+  for index, member in pending:
+    if results[index] is None:
+      results[index] = {"row": index, "email": member.email, "status": EXISTS}
+
+  logger.info(f"Bulk onboarding for company {c_id}: {len(created)} of {len(rows)} staff created")
+  return results
+
+
+def onboarding_report(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+  summary = {status: 0 for status in (CREATED, EXISTS, DUPLICATE, INVALID)}
+  for result in results:
+    summary[result["status"]] += 1
+  return {"summary": summary, "results": results}
+
+
+async def stream_onboarding(c_id: int, rows: List[Any]) -> AsyncIterator[str]:
+  """
+  Run onboard_staff and yield NDJSON progress events followed by the final report.
+
+  Uses its own database session because request dependencies are closed before a streamed body is sent. If the
+  client disconnects, the work is cancelled before the generator closes, so nothing keeps hashing after the
+  request (and its admission slot) is gone.
+  """
+  progress: asyncio.Queue = asyncio.Queue()
+
+  async def run():
+    async with SessionLocal(bind=engine) as db:
+      return await onboard_staff(db, c_id, rows, progress.put_nowait)
+
+  task = asyncio.create_task(run())
+  task.add_done_callback(lambda _: progress.put_nowait(None))
+
+  try:
+    while (event := await progress.get()) is not None:
+      yield json.dumps(event) + "\n"
+
+    try:
+      yield json.dumps({"stage": "done", **onboarding_report(task.result())}) + "\n"
+    except HashingPoolBusy:
+      yield json.dumps({"stage": "error", "detail": "Service busy, please retry"}) + "\n"
+    except Exception as e:
+      logger.error(f"Bulk onboarding for company {c_id} failed: {str(e)}")
+      yield json.dumps({"stage": "error", "detail": f"Internal Server Error: {str(e)}"}) + "\n"
+  finally:
+    if not task.done():
+      logger.warning(f"Bulk onboarding for company {c_id} cancelled: client disconnected")
+      task.cancel()
+      # Uncommitted rows are rolled back when the session closes
+      await asyncio.gather(task, return_exceptions=True)
+
+
+def _validation_detail(error: ValidationError) -> str:
+  return "; ".join(f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in error.errors())
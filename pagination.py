@@ -0,0 +1,43 @@
+import base64
+import json
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(last_key: int) -> str:
+  """Opaque cursor pointing just past the last returned row."""
+  return base64.urlsafe_b64encode(json.dumps({"k": last_key}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+  """Return the key encoded in a cursor, or None for the first page."""
+  if not cursor:
+    return None
+  try:
+    key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["k"]
+  except (ValueError, KeyError, TypeError):
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+  if not isinstance(key, int):
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+  return key
+
+
+def paginate(rows: Sequence, limit: int, key: Callable) -> Tuple[List, Optional[str]]:
+  """
+  Split rows fetched with limit + 1 into the page and the cursor for the next one.
+
+  Args:
+      rows: Rows ordered by key, at most limit + 1 of them
+      limit: Page size requested by the client
+      key: Returns the monotonic sequence value of a row
+
+  Returns:
+      (page rows, next cursor or None on the last page)
+  """
+  items = list(rows[:limit])
+  next_cursor = encode_cursor(key(items[-1])) if len(rows) > limit else None
+  return items, next_cursor
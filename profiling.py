@@ -0,0 +1,187 @@
+import asyncio
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import load_environment
+from db import valkey_client
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+# The middleware and its hooks are only installed when PROFILING_ENABLED is true, so a disabled hook costs nothing
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")  # X-Profile-Token value that profiles a request on demand
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))  # share of requests profiled at random
+PROFILING_MODE = os.getenv("PROFILING_MODE", "cprofile")  # cprofile (pstats) or sampling (speedscope)
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", 1))  # sampling mode
+PROFILING_DIR = os.getenv("PROFILING_DIR", "/tmp/account-mgr-profiles")
+
+PROFILE_HEADER = b"x-profile-token"
+
+# Statements and commands issued by the request being profiled; None outside of it
+_trace: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("profiling_trace", default=None)
+
+
+def _record(kind: str, text: str, seconds: float):
+  trace = _trace.get()
+  if trace is not None:
+    trace.append({"type": kind, "command": text, "ms": round(seconds * 1000, 3)})
+
+
+def install(engine):
+  """Capture the SQL statements and Valkey commands of profiled requests."""
+  from sqlalchemy import event
+
+  sync_engine = getattr(engine, "sync_engine", engine)
+
+  @event.listens_for(sync_engine, "before_cursor_execute")
+  def _start(conn, cursor, statement, parameters, context, executemany):
+    if _trace.get() is not None:
+      conn.info.setdefault("profiling_query_start", []).append(time.perf_counter())
+
+  @event.listens_for(sync_engine, "after_cursor_execute")
+  def _stop(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("profiling_query_start")
+    if _trace.get() is not None and starts:
+      _record("sql", statement, time.perf_counter() - starts.pop())
+
+  valkey_client.command_hooks.append(lambda command, seconds: _record("valkey", command, seconds))
+
+
+class SamplingProfiler:
+  """Samples the event loop thread's stack at a fixed interval and exports the samples as speedscope JSON."""
+
+  def __init__(self, interval_ms: float):
+    self.interval = interval_ms / 1000
+    self.thread_id = threading.get_ident()
+    self.frames: List[Dict[str, Any]] = []
+    self.samples: List[List[int]] = []
+    self._frame_index: Dict[tuple, int] = {}
+    self._stopped = threading.Event()
+    self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+  def start(self):
+    self._thread.start()
+
+  def stop(self):
+    self._stopped.set()
+    self._thread.join()
+
+  def _run(self):
+    while not self._stopped.wait(self.interval):
+      frame = sys._current_frames().get(self.thread_id)
+      stack = []
+      while frame is not None:
+        code = frame.f_code
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+          index = self._frame_index[key] = len(self.frames)
+          self.frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+        stack.append(index)
+        frame = frame.f_back
+      stack.reverse()
+      self.samples.append(stack)
+
+  def dump(self, path: str, name: str):
+    weight = self.interval * 1000
+    with open(path, "w") as f:
+      json.dump({
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": self.frames},
+        "profiles": [{
+          "type": "sampled",
+          "name": name,
+          "unit": "milliseconds",
+          "startValue": 0,
+          "endValue": weight * len(self.samples),
+          "samples": self.samples,
+          "weights": [weight] * len(self.samples),
+        }],
+        "name": name,
+        "exporter": "account-mgr",
+      }, f)
+
+
+class ProfilingMiddleware:
+  """
+  Profile single requests selected by the X-Profile-Token header or by PROFILING_SAMPLE_RATE.
+
+  Only one request is profiled at a time per worker. Both profilers see the whole event loop thread, so other
+  requests running concurrently can show up in the profile; the SQL and Valkey trace only holds the profiled
+  request's own calls.
+  """
+
+  def __init__(self, app: ASGIApp):
+    self.app = app
+    self._busy = False
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+
+  def _selected(self, scope: Scope) -> bool:
+    if PROFILING_TOKEN:
+      for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+          return hmac.compare_digest(value, PROFILING_TOKEN.encode())
+    return PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send):
+    if scope["type"] != "http" or self._busy or not self._selected(scope):
+      await self.app(scope, receive, send)
+      return
+
+    self._busy = True
+    trace: List[Dict[str, Any]] = []
+    token = _trace.set(trace)
+    if PROFILING_MODE == "sampling":
+      profiler = SamplingProfiler(PROFILING_INTERVAL_MS)
+      profiler.start()
+    else:
+      profiler = cProfile.Profile()
+      profiler.enable()
+    start = time.perf_counter()
+
+    try:
+      await self.app(scope, receive, send)
+    finally:
+      elapsed_ms = (time.perf_counter() - start) * 1000
+      if isinstance(profiler, SamplingProfiler):
+        profiler.stop()
+      else:
+        profiler.disable()
+      _trace.reset(token)
+      self._busy = False
+
+      route = getattr(scope.get("route"), "path", scope["path"])
+      await asyncio.to_thread(_write, profiler, trace, scope["method"], route, elapsed_ms)
+
+
+def _write(profiler, trace: List[Dict[str, Any]], method: str, route: str, elapsed_ms: float):
+  slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+  base = os.path.join(PROFILING_DIR, f"{int(time.time())}_{method}_{slug}_{elapsed_ms:.0f}ms")
+  name = f"{method} {route} ({elapsed_ms:.1f} ms)"
+
+  try:
+    if isinstance(profiler, SamplingProfiler):
+      profiler.dump(f"{base}.speedscope.json", name)
+    else:
+      profiler.dump_stats(f"{base}.pstats")
+    with open(f"{base}.trace.json", "w") as f:
+      json.dump({"request": name, "calls": trace}, f, indent=2)
+  except OSError as e:
+    logger.warning(f"Could not write profile for {name}: {str(e)}")
+    return
+
+  logger.info(f"Profiled {name} to {base}.*")
@@ -0,0 +1,170 @@
+import logging
+import os
+import secrets
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from redis.exceptions import RedisError
+
+from config import load_environment
+from db.valkey_client import InstrumentedRedis, redis_pool
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+# Sliding-window limits on credential endpoints, checked before any bcrypt work
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", 60))  # seconds
+RATE_LIMIT_IP_MAX = int(os.getenv("RATE_LIMIT_IP_MAX", 30))  # attempts per IP per window
+RATE_LIMIT_EMAIL_MAX = int(os.getenv("RATE_LIMIT_EMAIL_MAX", 10))  # attempts per email per window
+RATE_LIMIT_DETAIL = os.getenv("RATE_LIMIT_DETAIL", "Too many attempts, please retry later")
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+RATE_LIMIT_LOCAL_SIZE = int(os.getenv("RATE_LIMIT_LOCAL_SIZE", 10000))  # blocked keys remembered per worker
+
+# Checks every window in one call and records the attempt only if none of them is full, so rejected attempts
+# don't extend a block. KEYS are the windows, ARGV is now (ms), window (ms), a unique member, then one limit per key.
+# Returns 0 when allowed, otherwise {milliseconds until the fullest window frees a slot, 1-based index of that key}.
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local retry, blocked = 0, 0
+for i, key in ipairs(KEYS) do
+  redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+  if redis.call('ZCARD', key) >= tonumber(ARGV[3 + i]) then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    local wait = tonumber(oldest[2]) + window - now
+    if wait > retry then
+      retry, blocked = wait, i
+    end
+  end
+end
+if blocked > 0 then
+  return {retry, blocked}
+end
+for _, key in ipairs(KEYS) do
+  redis.call('ZADD', key, now, ARGV[3])
+  redis.call('PEXPIRE', key, window)
+end
+return 0
+"""
+
+_client = InstrumentedRedis(connection_pool=redis_pool)
+_sliding_window = _client.register_script(SLIDING_WINDOW_SCRIPT)
+
+
+class RateLimitStats:
+  """Outcome counters of this worker's rate limit checks."""
+
+  def __init__(self):
+    self.allowed = 0
+    self.rejected = 0
+    self.rejected_local = 0
+    self.errors = 0
+
+  def as_dict(self) -> Dict[str, Any]:
+    return {
+      "enabled": RATE_LIMIT_ENABLED,
+      "allowed": self.allowed,
+      "rejected": self.rejected,
+      "rejected_local": self.rejected_local,
+      "errors": self.errors,
+      "blocked_keys": len(_blocked),
+    }
+
+
+stats = RateLimitStats()
+
+# key -> monotonic deadline; keys Valkey reported as full are rejected here without a round trip
+_blocked: Dict[str, float] = {}
+
+
+def rate_limit_stats() -> Dict[str, Any]:
+  return stats.as_dict()
+
+
+def client_ip(request: Request) -> str:
+  if RATE_LIMIT_TRUST_FORWARDED:
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+      return forwarded.split(",")[0].strip()
+  return request.client.host if request.client else "unknown"
+
+
+def _locally_blocked(keys: List[str]) -> Optional[float]:
+  """Seconds left on the longest local block among keys, or None if none of them is blocked."""
+  now = time.monotonic()
+  remaining = None
+  for key in keys:
+    deadline = _blocked.get(key)
+    if deadline is None:
+      continue
+    if deadline <= now:
+      del _blocked[key]
+    else:
+      remaining = max(remaining or 0.0, deadline - now)
+  return remaining
+
+
+def _remember_block(key: str, seconds: float):
+  if len(_blocked) >= RATE_LIMIT_LOCAL_SIZE:
+    now = time.monotonic()
+    for expired in [k for k, deadline in _blocked.items() if deadline <= now]:
+      del _blocked[expired]
+    if len(_blocked) >= RATE_LIMIT_LOCAL_SIZE:
+      _blocked.pop(next(iter(_blocked)))
+  _blocked[key] = time.monotonic() + seconds
+
+
+async def check(scope: str, ip: str, email: Optional[str] = None) -> Tuple[bool, float]:
+  """
+  Record an attempt against the per-IP and per-email windows of scope.
+
+  Returns:
+      (allowed, seconds until a retry can succeed). Fails open when Valkey is unavailable.
+  """
+  if not RATE_LIMIT_ENABLED:
+    return True, 0.0
+
+  limits = {f"ratelimit:{scope}:ip:{ip}": RATE_LIMIT_IP_MAX}
+  if email:
+    limits[f"ratelimit:{scope}:email:{email.strip().lower()}"] = RATE_LIMIT_EMAIL_MAX
+  keys = list(limits)
+
+  remaining = _locally_blocked(keys)
+  if remaining is not None:
+    stats.rejected_local += 1
+    return False, remaining
+
+  now_ms = int(time.time() * 1000)
+  try:
+    result = await _sliding_window(
+      keys=keys,
+      args=[now_ms, RATE_LIMIT_WINDOW * 1000, f"{now_ms}-{secrets.token_hex(4)}", *limits.values()],
+    )
+  except RedisError as e:
+    stats.errors += 1
+    logger.warning(f"Rate limit check failed, allowing request: {str(e)}")
+    return True, 0.0
+
+  if result == 0:
+    stats.allowed += 1
+    return True, 0.0
+
+  retry_ms, blocked_index = int(result[0]), int(result[1])
+  seconds = retry_ms / 1000
+  _remember_block(keys[blocked_index - 1], seconds)
+  stats.rejected += 1
+  return False, seconds
+
+
+async def enforce(request: Request, scope: str, email: Optional[str] = None):
+  """Raise a 429 with Retry-After when the caller's IP or the given email exceeded the limit for scope."""
+  allowed, retry_after = await check(scope, client_ip(request), email)
+  if not allowed:
+    raise HTTPException(
+      status_code=429,
+      detail=RATE_LIMIT_DETAIL,
+      headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+    )
@@ -1,31 +1,68 @@
 import datetime
 
+from redis.asyncio import Redis
+from sqlalchemy import insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from db.models import UserTable
-from encryption import get_password_hash, verify_password
+from encryption import hash_password_async, verify_password_async
 from schemas import User, ChangeStatusRequest, ChangePasswordRequest
+from session_manager import invalidate_user_sessions
 
 
 async def create_user(db: AsyncSession, user: User, role: str, c_id: int = None):
   """Create a new user."""
-  db_user = UserTable(
-    email=user.email,
-    first_name=user.first_name,
-    last_name=user.last_name,
-    role=role,
-    company_id=c_id,
-    password=get_password_hash(user.password),
-    created_at=datetime.datetime.now(),
-    updated_at=datetime.datetime.now(),
+  hashed_password = await hash_password_async(user.password)
+  now = datetime.datetime.now()
+  result = await db.execute(
+    insert(UserTable)
+    .values(
+      email=user.email,
+      first_name=user.first_name,
+      last_name=user.last_name,
+      role=role,
+      company_id=c_id,
+      password=hashed_password,
+      created_at=now,
+      updated_at=now,
+    )
+    .returning(UserTable)
   )
-  db.add(db_user)
+  db_user = result.scalar_one()
   await db.commit()
-  await db.refresh(db_user)
   return db_user
 
 
+async def create_users(db: AsyncSession, users: list[dict], role: str, c_id: int = None):
+  """
+  Insert many users with already hashed passwords in multi-row INSERTs and one commit.
+
+  Rows whose email is taken by the time of the insert are skipped; only the created users are returned.
+  """
+  if not users:
+    return []
+
+  now = datetime.datetime.now()
+  result = await db.scalars(
+    pg_insert(UserTable).on_conflict_do_nothing(index_elements=[UserTable.email]).returning(UserTable),
+    [{**user, "role": role, "company_id": c_id, "created_at": now, "updated_at": now} for user in users]
+  )
+  db_users = result.all()
+  await db.commit()
+  return db_users
+
+
+async def get_existing_emails(db: AsyncSession, emails: list[str]):
+  """Return which of the given emails already belong to a user, active or not, in a single query."""
+  if not emails:
+    return set()
+
+  result = await db.execute(select(UserTable.email).filter(UserTable.email.in_(emails)))
+  return set(result.scalars().all())
+
+
 async def get_user_by_email(db: AsyncSession, email: str):
   """Retrieve a user by email."""
   result = await db.execute(select(UserTable).filter(UserTable.email == email, UserTable.deactivated == False))
@@ -44,44 +81,80 @@ async def get_accounts_by_c_id(db: AsyncSession, c_id: int):
   return result.scalars().all()
 
 
-async def confirm_email(db: AsyncSession, email: str):
-  """Confirm a user's email."""
-  user = await get_user_by_email(db, email)
+async def get_accounts_page_by_c_id(db: AsyncSession, c_id: int, limit: int, after_u_id: int = None):
+  """Retrieve up to limit accounts of a c_id in u_id order, starting after after_u_id."""
+  query = select(UserTable).filter(UserTable.company_id == c_id)
+  if after_u_id is not None:
+    query = query.filter(UserTable.u_id > after_u_id)
+  result = await db.execute(query.order_by(UserTable.u_id).limit(limit))
+  return result.scalars().all()
 
-  if not user or user.email_confirmed:
-    return None
 
-  user.email_confirmed = True
-  user.updated_at = datetime.datetime.now()
-  user.confirmed_at = datetime.datetime.now()
+async def stream_accounts_by_c_id(db: AsyncSession, c_id: int, chunk_size: int):
+  """Stream the accounts of a c_id in u_id order from a server-side cursor, chunk_size rows at a time."""
+  return await db.stream_scalars(
+    select(UserTable).filter(UserTable.company_id == c_id).order_by(UserTable.u_id)
+    .execution_options(yield_per=chunk_size)
+  )
 
-  await db.commit()
-  await db.refresh(user)
-  return user
+
+async def confirm_email(db: AsyncSession, email: str):
+  """Confirm a user's email."""
+  now = datetime.datetime.now()
+  return await _update_user(
+    db,
+    UserTable.email == email, UserTable.deactivated == False, UserTable.email_confirmed == False,
+    email_confirmed=True, updated_at=now, confirmed_at=now
+  )
 
 
 async def change_password(db: AsyncSession, req: ChangePasswordRequest):
   """Change a user's password."""
   user = await get_user_by_email(db, req.email)
 
-  if not user or not verify_password(req.old_password, user.password):
+  if not user or not await verify_password_async(req.old_password, user.password):
     return None
 
-  user.password = get_password_hash(req.new_password)
-  user.updated_at = datetime.datetime.now()
+  hashed_password = await hash_password_async(req.new_password)
+  return await _update_user(
+    db, UserTable.id == user.id, password=hashed_password, updated_at=datetime.datetime.now()
+  )
+
+
+async def update_password_hash(db: AsyncSession, user: UserTable, hashed_password: str):
+  """Persist a re-computed hash for a user whose password is unchanged."""
+  user.password = hashed_password
 
   await db.commit()
-  await db.refresh(user)
   return user
 
 
-async def change_status(db: AsyncSession, req: ChangeStatusRequest):
-  """Change a user's status."""
-  user = await get_user_by_email_ignore_status(db, req.email)
+async def change_status(db: AsyncSession, req: ChangeStatusRequest, valkey: Redis = None):
+  """Change a user's status. Deactivation also ends the user's sessions when a Valkey client is given."""
+  user = await _update_user(
+    db, UserTable.email == req.email, deactivated=req.deactivated, updated_at=datetime.datetime.now()
+  )
+
+  if not user:
+    return None
 
-  user.deactivated = req.deactivated
-  user.updated_at = datetime.datetime.now()
+  if req.deactivated and valkey is not None:
+    await invalidate_user_sessions(valkey, user.email, str(user.id))
 
-  await db.commit()
-  await db.refresh(user)
+  return user
+
+
+async def _update_user(db: AsyncSession, *criteria, **values):
+  """Update a single user in one UPDATE ... RETURNING; returns None when no row matched."""
+  result = await db.execute(
+    update(UserTable)
+    .where(*criteria)
+    .values(**values)
+    .returning(UserTable)
+    .execution_options(synchronize_session=False, populate_existing=True)
+  )
+  user = result.scalar_one_or_none()
+
+  if user is not None:
+    await db.commit()
   return user
@@ -0,0 +1,218 @@
+import datetime
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import DateTime
+
+from config import load_environment
+from db.valkey_client import InstrumentedRedis, redis_pool
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+# Read-through cache for rarely changing company and store lookups
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_STORE_TTL = int(os.getenv("CACHE_STORE_TTL", 300))  # seconds
+CACHE_COMPANY_TTL = int(os.getenv("CACHE_COMPANY_TTL", 300))  # seconds
+
+# Bumped whenever the cached row layout changes, so entries written by older code are ignored
+KEY_PREFIX = "cache:v2"
+
+# Seconds an invalidation is remembered; must outlive the slowest database load of a read-through miss
+GENERATION_TTL = 3600
+
+# Writes the loaded value only if the key's generation is still the one read before loading, so a load that
+# raced an edit cannot overwrite the invalidation with the row as it was before the edit.
+# KEYS are the entry and its generation, ARGV the expected generation ('' for none), the payload and the TTL.
+FILL_SCRIPT = """
+local current = redis.call('GET', KEYS[2]) or ''
+if current ~= ARGV[1] then
+  return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+_client = InstrumentedRedis(connection_pool=redis_pool)
+_fill = _client.register_script(FILL_SCRIPT)
+
+
+def generation_key(key: str) -> str:
+  return f"{key}:gen"
+
+
+def store_key_by_s_id(s_id: int) -> str:
+  return f"{KEY_PREFIX}:store:s:{s_id}"
+
+
+def store_key_by_uuid(id: str) -> str:
+  return f"{KEY_PREFIX}:store:u:{id}"
+
+
+def stores_key_by_c_id(c_id: int) -> str:
+  return f"{KEY_PREFIX}:stores:c:{c_id}"
+
+
+def company_key_by_c_id(c_id: int) -> str:
+  return f"{KEY_PREFIX}:company:c:{c_id}"
+
+
+class CacheStats:
+  """Hit ratio and latency counters for one kind of cached lookup."""
+
+  def __init__(self):
+    self.hits = 0
+    self.misses = 0
+    self.errors = 0
+    self.stale_fills = 0
+    self.hit_ms = 0.0
+    self.miss_ms = 0.0
+
+  def as_dict(self) -> Dict[str, Any]:
+    lookups = self.hits + self.misses
+    return {
+      "hits": self.hits,
+      "misses": self.misses,
+      "errors": self.errors,
+      "stale_fills": self.stale_fills,
+      "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+      "avg_hit_ms": round(self.hit_ms / self.hits, 3) if self.hits else 0.0,
+      "avg_miss_ms": round(self.miss_ms / self.misses, 3) if self.misses else 0.0,
+    }
+
+
+_stats: Dict[str, CacheStats] = {}
+
+
+def cache_stats() -> Dict[str, Any]:
+  return {"enabled": CACHE_ENABLED, "lookups": {name: stats.as_dict() for name, stats in _stats.items()}}
+
+
+def _to_row(obj) -> Dict[str, Any]:
+  return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+
+def _encode(value):
+  if isinstance(value, datetime.datetime):
+    return value.isoformat()
+  raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _serialize(value) -> str:
+  if isinstance(value, (list, tuple)):
+    return json.dumps([_to_row(obj) for obj in value], default=_encode)
+  return json.dumps(_to_row(value), default=_encode)
+
+
+def _from_row(model, row: Dict[str, Any]):
+  for column in model.__table__.columns:
+    if isinstance(column.type, DateTime) and isinstance(row.get(column.key), str):
+      row[column.key] = datetime.datetime.fromisoformat(row[column.key])
+  return model(**row)
+
+
+def _deserialize(model, payload: str):
+  data = json.loads(payload)
+  if isinstance(data, list):
+    return [_from_row(model, row) for row in data]
+  return _from_row(model, data)
+
+
+async def read_through(name: str, key: str, ttl: int, model, loader: Callable[[], Awaitable[Any]]):
+  """
+  Return the cached value for key, or load it from the database and cache it.
+
+  Args:
+      name: Lookup name used for the counters
+      key: Cache key
+      ttl: Seconds to keep the value
+      model: ORM class the cached rows are rebuilt into
+      loader: Coroutine factory querying the database
+
+  Returns:
+      A model instance, a list of them, or None. Cached instances are not attached to a session.
+  """
+  if not CACHE_ENABLED:
+    return await loader()
+
+  stats = _stats.setdefault(name, CacheStats())
+  start = time.perf_counter()
+
+  try:
+    cached = await _client.get(key)
+  except RedisError as e:
+    stats.errors += 1
+    logger.warning(f"Cache read failed for {key}: {str(e)}")
+    cached = None
+
+  if cached is not None:
+    stats.hits += 1
+    stats.hit_ms += (time.perf_counter() - start) * 1000
+    return _deserialize(model, cached)
+
+  # Read before loading: an invalidation from here on changes it and the fill below is skipped
+  generation = await _generation(key)
+
+  value = await loader()
+  if value is not None and generation is not None and not await _fill_if_current(key, generation, value, ttl):
+    stats.stale_fills += 1
+
+  stats.misses += 1
+  stats.miss_ms += (time.perf_counter() - start) * 1000
+  return value
+
+
+async def peek(key: str, model):
+  """Return the cached value for key without loading it on a miss; None when absent or the cache is off."""
+  if not CACHE_ENABLED:
+    return None
+  try:
+    cached = await _client.get(key)
+  except RedisError as e:
+    logger.warning(f"Cache read failed for {key}: {str(e)}")
+    return None
+  return _deserialize(model, cached) if cached is not None else None
+
+
+async def _generation(key: str) -> Optional[str]:
+  """Current invalidation generation of key ('' if never invalidated), or None when Valkey is unavailable."""
+  try:
+    return await _client.get(generation_key(key)) or ""
+  except RedisError as e:
+    logger.warning(f"Cache read failed for {generation_key(key)}: {str(e)}")
+    return None
+
+
+async def _fill_if_current(key: str, generation: str, value, ttl: int) -> bool:
+  """Cache a loaded value unless key was invalidated since generation was read. Returns False when skipped."""
+  try:
+    return bool(await _fill(keys=[key, generation_key(key)], args=[generation, _serialize(value), ttl]))
+  except RedisError as e:
+    logger.warning(f"Cache write failed for {key}: {str(e)}")
+    return True
+
+
+async def invalidate(*keys: Optional[str]):
+  """
+  Drop cached entries so the next read goes to the database.
+
+  Edits invalidate rather than write the new row, so concurrent edits cannot leave an older version cached.
+  Bumping each key's generation also stops read-through loads already in flight from caching what they read.
+  """
+  keys = [key for key in keys if key]
+  if not CACHE_ENABLED or not keys:
+    return
+  try:
+    async with _client.pipeline(transaction=True) as pipe:
+      for key in keys:
+        pipe.incr(generation_key(key))
+        pipe.expire(generation_key(key), GENERATION_TTL)
+        pipe.delete(key)
+      await pipe.execute()
+  except RedisError as e:
+    logger.warning(f"Cache invalidation failed for {keys}: {str(e)}")
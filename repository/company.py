@@ -1,19 +1,21 @@
+import datetime
+
+from sqlalchemy import insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from schemas import CreateCompany, EditCompany, EditCompanyStatus
 from db.models import CompanyTable
+from repository import cache
 
 
 async def create_company(db: AsyncSession, company: CreateCompany):
-  db_company = CompanyTable(
-    name=company.name,
-    uen=company.uen,
-    email=company.email,
-    user_id=company.user_id
+  result = await db.execute(
+    insert(CompanyTable)
+    .values(name=company.name, uen=company.uen, email=company.email, user_id=company.user_id)
+    .returning(CompanyTable)
   )
-  db.add(db_company)
+  db_company = result.scalar_one()
   await db.commit()
-  await db.refresh(db_company)
   return db_company
 
 
@@ -24,41 +26,89 @@ async def get_companies_by_user_id(db: AsyncSession, user_id: str):
   return result.scalars().all()
 
 
+async def get_companies_page_by_user_id(db: AsyncSession, user_id: str, limit: int, after_c_id: int = None):
+  """Retrieve up to limit companies of a user_id in c_id order, starting after after_c_id."""
+  query = select(CompanyTable).filter(CompanyTable.user_id == user_id, CompanyTable.deactivated == False)
+  if after_c_id is not None:
+    query = query.filter(CompanyTable.c_id > after_c_id)
+  result = await db.execute(query.order_by(CompanyTable.c_id).limit(limit))
+  return result.scalars().all()
+
+
 async def get_company_by_c_id(db: AsyncSession, c_id: int):
   """Retrieve a company by c_id."""
+  return await cache.read_through(
+    "company_by_c_id", cache.company_key_by_c_id(c_id), cache.CACHE_COMPANY_TTL, CompanyTable,
+    lambda: _fetch_company_by_c_id(db, c_id)
+  )
+
+
+async def _fetch_company_by_c_id(db: AsyncSession, c_id: int):
   result = await db.execute(select(CompanyTable).filter(CompanyTable.c_id == c_id, CompanyTable.deactivated == False))
   return result.scalar_one_or_none()
 
 
+async def get_company_version_by_c_id(db: AsyncSession, c_id: int):
+  """(id, version) of an active company, from the cached company if present, otherwise without loading the full row."""
+  cached = await cache.peek(cache.company_key_by_c_id(c_id), CompanyTable)
+  if cached is not None:
+    return cached.id, cached.version
+
+  result = await db.execute(
+    select(CompanyTable.id, CompanyTable.version).filter(CompanyTable.c_id == c_id, CompanyTable.deactivated == False))
+  return result.one_or_none()
+
+
+async def get_companies_by_c_ids(db: AsyncSession, c_ids: list[int]):
+  """Retrieve the active companies matching the given c_ids in a single query."""
+  if not c_ids:
+    return []
+
+  result = await db.execute(
+    select(CompanyTable).filter(CompanyTable.c_id.in_(c_ids), CompanyTable.deactivated == False))
+  return result.scalars().all()
+
+
 async def edit_company(db: AsyncSession, company: EditCompany):
   """Edit the name, uen, and email of a company by its ID."""
-  result = await db.execute(select(CompanyTable).filter(CompanyTable.id == company.id))
-  db_company = result.scalars().first()
+  db_company = await _update_company(db, company.id, name=company.name, uen=company.uen, email=company.email)
 
   if db_company is None:
     return None
 
-  db_company.name = company.name
-  db_company.uen = company.uen
-  db_company.email = company.email
-
-  await db.commit()
-  await db.refresh(db_company)
-
+  await _sync_company_cache(db_company)
   return db_company
 
 
 async def edit_company_status(db: AsyncSession, company: EditCompanyStatus):
   """Edit the status of a company by its ID."""
-  result = await db.execute(select(CompanyTable).filter(CompanyTable.id == company.id))
-  db_company = result.scalars().first()
+  db_company = await _update_company(db, company.id, deactivated=company.deactivated)
 
   if db_company is None:
     return None
 
-  db_company.deactivated = company.deactivated
+  # The company's store list is only served while the company is active
+  await cache.invalidate(cache.company_key_by_c_id(db_company.c_id), cache.stores_key_by_c_id(db_company.c_id))
+  return db_company
+
 
-  await db.commit()
-  await db.refresh(db_company)
+async def _update_company(db: AsyncSession, id: str, **values):
+  """Update a company in a single UPDATE ... RETURNING."""
+  result = await db.execute(
+    update(CompanyTable)
+    .where(CompanyTable.id == id)
+    .values(**values, version=CompanyTable.version + 1, updated_at=datetime.datetime.now())
+    .returning(CompanyTable)
+    .execution_options(synchronize_session=False)
+  )
+  db_company = result.scalar_one_or_none()
 
+  if db_company is not None:
+    await db.commit()
   return db_company
+
+
+async def _sync_company_cache(db_company: CompanyTable):
+  """Drop the cached company after a change; the next read loads the new row."""
+  await cache.invalidate(cache.company_key_by_c_id(db_company.c_id))
+
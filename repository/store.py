@@ -1,24 +1,36 @@
+import datetime
+
+from sqlalchemy import insert, or_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from db.models import CompanyTable, StoreTable
+from repository import cache
 from schemas import CreateStore, EditStore, EditStoreStatus
 
 
 async def create_store(db: AsyncSession, store: CreateStore):
-  db_store = StoreTable(
-    name=store.name,
-    alias=store.alias,
-    company_id=store.company_id
+  result = await db.execute(
+    insert(StoreTable)
+    .values(name=store.name, alias=store.alias, company_id=store.company_id)
+    .returning(StoreTable, select(CompanyTable.c_id).filter(CompanyTable.id == store.company_id).scalar_subquery())
   )
-  db.add(db_store)
+  db_store, c_id = result.one()
   await db.commit()
-  await db.refresh(db_store)
+
+  await cache.invalidate(cache.stores_key_by_c_id(c_id))
   return db_store
 
 
 async def get_stores_by_c_id(db: AsyncSession, c_id: int):
   """Retrieve a list of stores associated with a given c_id."""
+  return await cache.read_through(
+    "stores_by_c_id", cache.stores_key_by_c_id(c_id), cache.CACHE_STORE_TTL, StoreTable,
+    lambda: _fetch_stores_by_c_id(db, c_id)
+  )
+
+
+async def _fetch_stores_by_c_id(db: AsyncSession, c_id: int):
   result = await db.execute(select(StoreTable).join(CompanyTable, StoreTable.company_id == CompanyTable.id)
   .filter(
     CompanyTable.c_id == c_id,
@@ -28,46 +40,131 @@ async def get_stores_by_c_id(db: AsyncSession, c_id: int):
   return result.scalars().all()
 
 
+async def get_stores_page_by_c_id(db: AsyncSession, c_id: int, limit: int, after_s_id: int = None):
+  """Retrieve up to limit stores of a c_id in s_id order, starting after after_s_id."""
+  query = select(StoreTable).join(CompanyTable, StoreTable.company_id == CompanyTable.id).filter(
+    CompanyTable.c_id == c_id,
+    CompanyTable.deactivated == False,
+    StoreTable.deactivated == False)
+  if after_s_id is not None:
+    query = query.filter(StoreTable.s_id > after_s_id)
+  result = await db.execute(query.order_by(StoreTable.s_id).limit(limit))
+  return result.scalars().all()
+
+
+async def stream_stores_by_c_id(db: AsyncSession, c_id: int, chunk_size: int):
+  """Stream the stores of a c_id in s_id order from a server-side cursor, chunk_size rows at a time."""
+  return await db.stream_scalars(
+    select(StoreTable).join(CompanyTable, StoreTable.company_id == CompanyTable.id).filter(
+      CompanyTable.c_id == c_id,
+      CompanyTable.deactivated == False,
+      StoreTable.deactivated == False)
+    .order_by(StoreTable.s_id)
+    .execution_options(yield_per=chunk_size)
+  )
+
+
 async def get_store_by_id(db: AsyncSession, s_id: int):
   """Retrieve store details with a given s_id."""
+  return await cache.read_through(
+    "store_by_s_id", cache.store_key_by_s_id(s_id), cache.CACHE_STORE_TTL, StoreTable,
+    lambda: _fetch_store_by_id(db, s_id)
+  )
+
+
+async def _fetch_store_by_id(db: AsyncSession, s_id: int):
   result = await db.execute(select(StoreTable).filter(StoreTable.s_id == s_id, StoreTable.deactivated == False))
   return result.scalar_one_or_none()
 
 
+async def get_store_version_by_s_id(db: AsyncSession, s_id: int):
+  """(id, version) of an active store, from the cached store if present, otherwise without loading the full row."""
+  cached = await cache.peek(cache.store_key_by_s_id(s_id), StoreTable)
+  if cached is not None:
+    return cached.id, cached.version
+
+  result = await db.execute(
+    select(StoreTable.id, StoreTable.version).filter(StoreTable.s_id == s_id, StoreTable.deactivated == False))
+  return result.one_or_none()
+
+
 async def get_store_by_uuid(db: AsyncSession, id: str):
   """Retrieve store details with a given uuid."""
+  return await cache.read_through(
+    "store_by_uuid", cache.store_key_by_uuid(id), cache.CACHE_STORE_TTL, StoreTable,
+    lambda: _fetch_store_by_uuid(db, id)
+  )
+
+
+async def _fetch_store_by_uuid(db: AsyncSession, id: str):
   result = await db.execute(select(StoreTable).filter(StoreTable.id == id, StoreTable.deactivated == False))
   return result.scalar_one_or_none()
 
 
-async def edit_store(db: AsyncSession, store: EditStore):
-  """Edit the name and alias of a store by its ID."""
-  result = await db.execute(select(StoreTable).filter(StoreTable.id == store.id))
-  db_store = result.scalars().first()
+async def get_store_version_by_uuid(db: AsyncSession, id: str):
+  """(id, version) of an active store, from the cached store if present, otherwise without loading the full row."""
+  cached = await cache.peek(cache.store_key_by_uuid(id), StoreTable)
+  if cached is not None:
+    return cached.id, cached.version
 
-  if db_store is None:
-    return None
+  result = await db.execute(
+    select(StoreTable.id, StoreTable.version).filter(StoreTable.id == id, StoreTable.deactivated == False))
+  return result.one_or_none()
 
-  db_store.name = store.name
-  db_store.alias = store.alias
 
-  await db.commit()
-  await db.refresh(db_store)
+async def get_stores_by_ids(db: AsyncSession, s_ids: list[int], ids: list[str]):
+  """Retrieve the active stores matching any of the given s_ids or uuids in a single query."""
+  criteria = []
+  if s_ids:
+    criteria.append(StoreTable.s_id.in_(s_ids))
+  if ids:
+    criteria.append(StoreTable.id.in_(ids))
+  if not criteria:
+    return []
+
+  result = await db.execute(select(StoreTable).filter(or_(*criteria), StoreTable.deactivated == False))
+  return result.scalars().all()
 
-  return db_store
+
+async def edit_store(db: AsyncSession, store: EditStore):
+  """Edit the name and alias of a store by its ID."""
+  return await _update_store(db, store.id, name=store.name, alias=store.alias)
 
 
 async def edit_store_status(db: AsyncSession, store: EditStoreStatus):
   """Edit the status of a store by its ID."""
-  result = await db.execute(select(StoreTable).filter(StoreTable.id == store.id))
-  db_store = result.scalars().first()
+  return await _update_store(db, store.id, deactivated=store.deactivated)
 
-  if db_store is None:
-    return None
 
-  db_store.deactivated = store.deactivated
+async def _update_store(db: AsyncSession, id: str, **values):
+  """Update a store in a single UPDATE ... RETURNING and keep the cache in step."""
+  result = await db.execute(
+    update(StoreTable)
+    .where(StoreTable.id == id)
+    .values(**values, version=StoreTable.version + 1, updated_at=datetime.datetime.now())
+    .returning(StoreTable, _owner_c_id())
+    .execution_options(synchronize_session=False)
+  )
+  row = result.first()
+
+  if row is None:
+    return None
 
   await db.commit()
-  await db.refresh(db_store)
 
+  db_store, c_id = row
+  await _sync_store_cache(db_store, c_id)
   return db_store
+
+
+def _owner_c_id():
+  """c_id of the company owning the store row being written, for use in RETURNING."""
+  return select(CompanyTable.c_id).filter(CompanyTable.id == StoreTable.company_id).correlate(StoreTable) \
+    .scalar_subquery()
+
+
+async def _sync_store_cache(db_store: StoreTable, c_id: int):
+  """Drop the cached store and its company's store list after a change; the next read loads the new row."""
+  await cache.invalidate(
+    cache.store_key_by_s_id(db_store.s_id), cache.store_key_by_uuid(db_store.id), cache.stores_key_by_c_id(c_id)
+  )
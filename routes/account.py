@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import schemas
 from db.database import get_db
+from db.valkey_client import get_valkey_raw
+from export import export_response
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
 from repository import account as crud
+from serialization import render
 
 router = APIRouter()
 
@@ -15,23 +20,47 @@ async def get_profile(email: str, db: AsyncSession = Depends(get_db)):
   if not user:
     raise HTTPException(status_code=404, detail="User not found")
 
-  return user
+  return render(schemas.StaffResponse, user)
 
 
-@router.get("/get/{c_id}", response_model=list[schemas.StaffResponse])
-async def get_stores(c_id: int, db: AsyncSession = Depends(get_db)):
-  """Retrieve a list of account objects for a specific c_id"""
+@router.get("/get/{c_id}", response_model=list[schemas.StaffResponse] | schemas.StaffPage)
+async def get_stores(
+  c_id: int,
+  limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+  cursor: str | None = None,
+  db: AsyncSession = Depends(get_db)
+):
+  """Retrieve a list of account objects for a specific c_id, one page at a time when limit or cursor is given"""
+  if limit is not None or cursor is not None:
+    limit = limit or DEFAULT_PAGE_SIZE
+    rows = await crud.get_accounts_page_by_c_id(db, c_id, limit + 1, decode_cursor(cursor))
+    items, next_cursor = paginate(rows, limit, lambda user: user.u_id)
+    return render(schemas.StaffPage, {"items": items, "next_cursor": next_cursor})
+
   stores = await crud.get_accounts_by_c_id(db, c_id)
 
   if not stores:
     raise HTTPException(status_code=404, detail="No accounts found for this company")
 
-  return stores
+  return render(schemas.StaffResponse, stores)
+
+
+@router.get("/export/{c_id}")
+async def export_accounts(c_id: int, fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")):
+  """Stream all account objects for a specific c_id as NDJSON or CSV"""
+  return export_response(
+    lambda db, chunk_size: crud.stream_accounts_by_c_id(db, c_id, chunk_size),
+    schemas.StaffResponse, fmt, f"accounts-{c_id}"
+  )
 
 
 @router.post("/edit/status")
-async def edit_staff_status(staff: schemas.ChangeStatusRequest, db: AsyncSession = Depends(get_db)):
-  updated_staff = await crud.change_status(db, staff)
+async def edit_staff_status(
+  staff: schemas.ChangeStatusRequest,
+  db: AsyncSession = Depends(get_db),
+  valkey: Redis = Depends(get_valkey_raw)
+):
+  updated_staff = await crud.change_status(db, staff, valkey)
 
   if updated_staff is None:
     raise HTTPException(status_code=404, detail="Staff details not found")
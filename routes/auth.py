@@ -1,25 +1,36 @@
 import json
+import logging
 from typing import Dict, Any
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import schemas
+from admission import admission_class
 from aws.sqs import send_message
 from constants.Role import Role
 from db.database import get_db
-from db.valkey_client import get_valkey
-from encryption import verify_password, generate_random_password
+from db.valkey_client import get_valkey_raw
+from encryption import HashingPoolBusy, generate_random_password, hash_password_async, needs_rehash, \
+  verify_password_async
+from onboarding import BulkInputError, onboard_staff, onboarding_report, parse_staff_rows, stream_onboarding
+from rate_limit import enforce
 from repository import account as crud
-from session_manager import get_current_user, invalidate_session, create_session
+from repository import company as company_crud
+from session_manager import get_current_user, invalidate_session, create_session, session_header
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
 @router.post("/register")
-async def register(user: schemas.User, db: AsyncSession = Depends(get_db)):
+@admission_class("auth")
+async def register(request: Request, user: schemas.User, db: AsyncSession = Depends(get_db)):
+  await enforce(request, "register", user.email)
+
   existing_user = await crud.get_user_by_email(db, user.email)
   if existing_user:
     raise HTTPException(status_code=400, detail="User already exists")
@@ -42,11 +53,14 @@ async def register(user: schemas.User, db: AsyncSession = Depends(get_db)):
       status_code=201,
       content={"message": "User registered successfully", "user": new_user.email}
     )
+  except HashingPoolBusy:
+    raise HTTPException(status_code=503, detail="Service busy, please retry")
   except Exception as e:
     raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 
 @router.post("/register/staff")
+@admission_class("auth")
 async def register_staff(staff: schemas.Staff, db: AsyncSession = Depends(get_db)):
   existing_user = await crud.get_user_by_email(db, staff.email)
   if existing_user:
@@ -74,27 +88,77 @@ async def register_staff(staff: schemas.Staff, db: AsyncSession = Depends(get_db
       status_code=201,
       content={"message": "User created successfully", "user": new_staff.email}
     )
+  except HashingPoolBusy:
+    raise HTTPException(status_code=503, detail="Service busy, please retry")
   except Exception as e:
     raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 
+@router.post("/register/staff/bulk")
+@admission_class("bulk")
+async def register_staff_bulk(request: Request, c_id: int, stream: bool = False, db: AsyncSession = Depends(get_db)):
+  """
+  Register many employees of a company from a JSON array or a CSV body with an email,first_name,last_name header.
+
+  Returns a result per row. With stream=true the response is NDJSON progress events ending with the same report.
+  """
+  try:
+    rows = parse_staff_rows(await request.body(), request.headers.get("content-type", ""))
+  except BulkInputError as e:
+    raise HTTPException(status_code=400, detail=str(e))
+
+  if not await company_crud.get_company_by_c_id(db, c_id):
+    raise HTTPException(status_code=404, detail="Company not found")
+
+  if stream:
+    return StreamingResponse(stream_onboarding(c_id, rows), media_type="application/x-ndjson")
+
+  try:
+    results = await onboard_staff(db, c_id, rows)
+  except HashingPoolBusy:
+    raise HTTPException(status_code=503, detail="Service busy, please retry")
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+
+  return JSONResponse(status_code=200, content=onboarding_report(results))
+
+
 @router.post("/login")
+@admission_class("auth")
 async def login(
+  request: Request,
   login_data: schemas.LoginRequest,
   db: AsyncSession = Depends(get_db),
-  valkey: Redis = Depends(get_valkey)
+  valkey: Redis = Depends(get_valkey_raw)
 ):
+  # Throttled before the user lookup and bcrypt, so credential stuffing is shed cheaply
+  await enforce(request, "login", login_data.email)
+
   user = await crud.get_user_by_email(db, login_data.email)
 
-  if user and verify_password(login_data.password, user.password):
+  try:
+    password_valid = user is not None and await verify_password_async(login_data.password, user.password)
+  except HashingPoolBusy:
+    raise HTTPException(status_code=503, detail="Service busy, please retry")
+
+  if password_valid:
     if user.email_confirmed is False:
       raise HTTPException(status_code=403, detail="Email not confirmed")
 
+    # Move the stored hash to the configured bcrypt cost while we have the plain password
+    if needs_rehash(user.password):
+      try:
+        await crud.update_password_hash(db, user, await hash_password_async(login_data.password))
+      except Exception as e:
+        await db.rollback()
+        logger.warning(f"Could not rehash password for {user.email}: {str(e)}")
+
     # Create a session for the authenticated user
     user_data = {
       "first_name": user.first_name,
       "last_name": user.last_name,
-      "email_confirmed": user.email_confirmed
+      "email_confirmed": user.email_confirmed,
+      "role": user.role
     }
 
     # Create session and get token
@@ -116,11 +180,12 @@ async def login(
 @router.post("/logout")
 async def logout(
   user_data: Dict[str, Any] = Depends(get_current_user),
-  valkey: Redis = Depends(get_valkey)
+  session_token: str = Depends(session_header),
+  valkey: Redis = Depends(get_valkey_raw)
 ):
   """Logout endpoint - invalidates the current session"""
   email = user_data.get("email")
-  success = await invalidate_session(valkey, email)
+  success = await invalidate_session(valkey, email, session_token)
 
   if not success:
     raise HTTPException(status_code=400, detail="Logout failed")
@@ -157,8 +222,14 @@ async def confirm_email(body: schemas.ConfirmEmailRequest, db: AsyncSession = De
 
 
 @router.post("/change-password")
-async def change_password(body: schemas.ChangePasswordRequest, db: AsyncSession = Depends(get_db)):
-  user = await crud.change_password(db, body)
+@admission_class("auth")
+async def change_password(request: Request, body: schemas.ChangePasswordRequest, db: AsyncSession = Depends(get_db)):
+  await enforce(request, "change-password", body.email)
+
+  try:
+    user = await crud.change_password(db, body)
+  except HashingPoolBusy:
+    raise HTTPException(status_code=503, detail="Service busy, please retry")
 
   if not user:
     raise HTTPException(status_code=400, detail="Failed to change password")
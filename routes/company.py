@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import schemas
 from repository import company as crud
 from db.database import get_db
+from etag import etag_matches, list_etag, not_modified, row_etag
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
+from serialization import render
 
 router = APIRouter()
 
@@ -24,25 +27,68 @@ async def create(company: schemas.CreateCompany, db: AsyncSession = Depends(get_
     raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 
-@router.get("/get/{user_id}", response_model=list[schemas.CompanyResponse])
-async def get_companies(user_id: str, db: AsyncSession = Depends(get_db)):
-  """Retrieve a list of company objects for a specific user_id"""
+@router.get("/get/{user_id}", response_model=list[schemas.CompanyResponse] | schemas.CompanyPage)
+async def get_companies(
+  user_id: str,
+  response: Response,
+  limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+  cursor: str | None = None,
+  if_none_match: str | None = Header(None),
+  db: AsyncSession = Depends(get_db)
+):
+  """Retrieve a list of company objects for a specific user_id, one page at a time when limit or cursor is given"""
+  if limit is not None or cursor is not None:
+    limit = limit or DEFAULT_PAGE_SIZE
+    rows = await crud.get_companies_page_by_user_id(db, user_id, limit + 1, decode_cursor(cursor))
+    items, next_cursor = paginate(rows, limit, lambda company: company.c_id)
+    etag = list_etag("companies", items, user_id, next_cursor)
+    if etag_matches(if_none_match, etag):
+      return not_modified(etag)
+    response.headers["ETag"] = etag
+    return render(schemas.CompanyPage, {"items": items, "next_cursor": next_cursor}, response)
+
   companies = await crud.get_companies_by_user_id(db, user_id)
 
   if not companies:
     raise HTTPException(status_code=404, detail="No companies found for this user")
 
-  return companies
+  etag = list_etag("companies", companies, user_id)
+  if etag_matches(if_none_match, etag):
+    return not_modified(etag)
+  response.headers["ETag"] = etag
+  return render(schemas.CompanyResponse, companies, response)
 
 
 @router.get("/get/details/{c_id}", response_model=schemas.CompanyResponse)
-async def get_profile(c_id: int, db: AsyncSession = Depends(get_db)):
+async def get_profile(
+  c_id: int,
+  response: Response,
+  if_none_match: str | None = Header(None),
+  db: AsyncSession = Depends(get_db)
+):
   """Retrieve a single company object by c_id"""
+  if if_none_match:
+    current = await crud.get_company_version_by_c_id(db, c_id)
+    if current is not None and etag_matches(if_none_match, row_etag("company", *current)):
+      return not_modified(row_etag("company", *current))
+
   company = await crud.get_company_by_c_id(db, c_id)
   if not company:
     raise HTTPException(status_code=404, detail="Company not found")
 
-  return company
+  response.headers["ETag"] = row_etag("company", company.id, company.version)
+  return render(schemas.CompanyResponse, company, response)
+
+
+@router.post("/details/batch", response_model=schemas.CompanyBatchResponse)
+async def get_companies_batch(req: schemas.CompanyBatchRequest, db: AsyncSession = Depends(get_db)):
+  """Retrieve company details for a list of c_ids, reporting the ones not found"""
+  companies = {company.c_id: company for company in await crud.get_companies_by_c_ids(db, req.c_ids)}
+
+  return render(schemas.CompanyBatchResponse, {
+    "by_c_id": {c_id: companies[c_id] for c_id in req.c_ids if c_id in companies},
+    "missing_c_ids": [c_id for c_id in dict.fromkeys(req.c_ids) if c_id not in companies],
+  })
 
 
 @router.post("/edit")
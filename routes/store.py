@@ -1,13 +1,17 @@
 import json
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import schemas
 from aws.sqs import send_message
 from db.database import get_db
+from etag import etag_matches, list_etag, not_modified, row_etag
+from export import export_response
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, paginate
 from repository import store as crud
+from serialization import render
 
 router = APIRouter()
 
@@ -38,37 +42,105 @@ async def create(store: schemas.CreateStore, db: AsyncSession = Depends(get_db))
     raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 
-@router.get("/get/{c_id}", response_model=list[schemas.StoreResponse])
-async def get_stores(c_id: int, db: AsyncSession = Depends(get_db)):
-  """Retrieve a list of store objects for a specific c_id"""
+@router.get("/get/{c_id}", response_model=list[schemas.StoreResponse] | schemas.StorePage)
+async def get_stores(
+  c_id: int,
+  response: Response,
+  limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+  cursor: str | None = None,
+  if_none_match: str | None = Header(None),
+  db: AsyncSession = Depends(get_db)
+):
+  """Retrieve a list of store objects for a specific c_id, one page at a time when limit or cursor is given"""
+  if limit is not None or cursor is not None:
+    limit = limit or DEFAULT_PAGE_SIZE
+    rows = await crud.get_stores_page_by_c_id(db, c_id, limit + 1, decode_cursor(cursor))
+    items, next_cursor = paginate(rows, limit, lambda store: store.s_id)
+    etag = list_etag("stores", items, c_id, next_cursor)
+    if etag_matches(if_none_match, etag):
+      return not_modified(etag)
+    response.headers["ETag"] = etag
+    return render(schemas.StorePage, {"items": items, "next_cursor": next_cursor}, response)
+
   stores = await crud.get_stores_by_c_id(db, c_id)
 
   if not stores:
     raise HTTPException(status_code=404, detail="No stores found for this company")
 
-  return stores
+  etag = list_etag("stores", stores, c_id)
+  if etag_matches(if_none_match, etag):
+    return not_modified(etag)
+  response.headers["ETag"] = etag
+  return render(schemas.StoreResponse, stores, response)
+
+
+@router.get("/export/{c_id}")
+async def export_stores(c_id: int, fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")):
+  """Stream all store objects for a specific c_id as NDJSON or CSV"""
+  return export_response(
+    lambda db, chunk_size: crud.stream_stores_by_c_id(db, c_id, chunk_size),
+    schemas.StoreResponse, fmt, f"stores-{c_id}"
+  )
 
 
 @router.get("/details/{s_id}", response_model=schemas.StoreResponse)
-async def get_store_by_id(s_id: int, db: AsyncSession = Depends(get_db)):
+async def get_store_by_id(
+  s_id: int,
+  response: Response,
+  if_none_match: str | None = Header(None),
+  db: AsyncSession = Depends(get_db)
+):
   """Retrieve store details by s_id"""
+  if if_none_match:
+    current = await crud.get_store_version_by_s_id(db, s_id)
+    if current is not None and etag_matches(if_none_match, row_etag("store", *current)):
+      return not_modified(row_etag("store", *current))
+
   store = await crud.get_store_by_id(db, s_id)
 
   if not store:
     raise HTTPException(status_code=404, detail="Store not found")
 
-  return store
+  response.headers["ETag"] = row_etag("store", store.id, store.version)
+  return render(schemas.StoreResponse, store, response)
 
 
 @router.get("/id/{id}", response_model=schemas.StoreResponse)
-async def get_store_by_id(id: str, db: AsyncSession = Depends(get_db)):
+async def get_store_by_id(
+  id: str,
+  response: Response,
+  if_none_match: str | None = Header(None),
+  db: AsyncSession = Depends(get_db)
+):
   """Retrieve store details by id"""
+  if if_none_match:
+    current = await crud.get_store_version_by_uuid(db, id)
+    if current is not None and etag_matches(if_none_match, row_etag("store", *current)):
+      return not_modified(row_etag("store", *current))
+
   store = await crud.get_store_by_uuid(db, id)
 
   if not store:
     raise HTTPException(status_code=404, detail="Store not found")
 
-  return store
+  response.headers["ETag"] = row_etag("store", store.id, store.version)
+  return render(schemas.StoreResponse, store, response)
+
+
+@router.post("/details/batch", response_model=schemas.StoreBatchResponse)
+async def get_stores_batch(req: schemas.StoreBatchRequest, db: AsyncSession = Depends(get_db)):
+  """Retrieve store details for a list of s_ids and/or ids, reporting the ones not found"""
+  stores = await crud.get_stores_by_ids(db, req.s_ids, req.ids)
+
+  by_s_id = {store.s_id: store for store in stores}
+  by_id = {store.id: store for store in stores}
+
+  return render(schemas.StoreBatchResponse, {
+    "by_s_id": {s_id: by_s_id[s_id] for s_id in req.s_ids if s_id in by_s_id},
+    "by_id": {id: by_id[id] for id in req.ids if id in by_id},
+    "missing_s_ids": [s_id for s_id in dict.fromkeys(req.s_ids) if s_id not in by_s_id],
+    "missing_ids": [id for id in dict.fromkeys(req.ids) if id not in by_id],
+  })
 
 
 @router.post("/edit")
@@ -1,7 +1,9 @@
 from datetime import datetime
 
 from humps import camelize
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+MAX_BATCH_SIZE = 500  # ids accepted per batch lookup
 
 
 def to_camel(string: str) -> str:
@@ -22,6 +24,16 @@ class Staff(BaseModel):
   c_id: int
 
 
+class BulkStaff(BaseModel):
+  email: str
+  first_name: str
+  last_name: str
+
+  class Config:
+    alias_generator = to_camel
+    populate_by_name = True  # Allows using both snake_case and camelCase
+
+
 class StaffResponse(BaseModel):
   id: str
   u_id: int
@@ -126,3 +138,67 @@ class StoreResponse(BaseModel):
     alias_generator = to_camel
     populate_by_name = True  # Allows using both snake_case and camelCase
     from_attributes = True  # Needed for ORM models
+
+
+class StaffPage(BaseModel):
+  items: list[StaffResponse]
+  next_cursor: str | None
+
+  class Config:
+    alias_generator = to_camel
+    populate_by_name = True  # Allows using both snake_case and camelCase
+
+
+class CompanyPage(BaseModel):
+  items: list[CompanyResponse]
+  next_cursor: str | None
+
+  class Config:
+    alias_generator = to_camel
+    populate_by_name = True  # Allows using both snake_case and camelCase
+
+
+class StorePage(BaseModel):
+  items: list[StoreResponse]
+  next_cursor: str | None
+
+  class Config:
+    alias_generator = to_camel
+    populate_by_name = True  # Allows using both snake_case and camelCase
+
+
+class StoreBatchRequest(BaseModel):
+  s_ids: list[int] = Field(default_factory=list, max_length=MAX_BATCH_SIZE)
+  ids: list[str] = Field(default_factory=list, max_length=MAX_BATCH_SIZE)  # store uuids
+
+  class Config:
+    alias_generator = to_camel
+    populate_by_name = True  # Allows using both snake_case and camelCase
+
+
+class StoreBatchResponse(BaseModel):
+  by_s_id: dict[int, StoreResponse]
+  by_id: dict[str, StoreResponse]
+  missing_s_ids: list[int]
+  missing_ids: list[str]
+
+  class Config:
+    alias_generator = to_camel
+    populate_by_name = True  # Allows using both snake_case and camelCase
+
+
+class CompanyBatchRequest(BaseModel):
+  c_ids: list[int] = Field(max_length=MAX_BATCH_SIZE)
+
+  class Config:
+    alias_generator = to_camel
+    populate_by_name = True  # Allows using both snake_case and camelCase
+
+
+class CompanyBatchResponse(BaseModel):
+  by_c_id: dict[int, CompanyResponse]
+  missing_c_ids: list[int]
+
+  class Config:
+    alias_generator = to_camel
+    populate_by_name = True  # Allows using both snake_case and camelCase
@@ -0,0 +1,37 @@
+"""
+Pick a bcrypt cost for this host.
+
+Usage:
+    python scripts/calibrate_bcrypt.py --budget-ms 250
+
+Prints the median hash time per cost and the BCRYPT_ROUNDS value to configure.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from encryption import BCRYPT_ROUNDS, calibrate_rounds  # noqa: E402
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Measure bcrypt cost against a latency budget")
+  parser.add_argument("--budget-ms", type=float, default=250, help="Maximum time for a single hash")
+  parser.add_argument("--min-rounds", type=int, default=4)
+  parser.add_argument("--max-rounds", type=int, default=16)
+  parser.add_argument("--samples", type=int, default=3, help="Hashes timed per cost")
+  args = parser.parse_args()
+
+  recommended, timings = calibrate_rounds(args.budget_ms, args.min_rounds, args.max_rounds, args.samples)
+
+  for rounds, elapsed_ms in timings.items():
+    marker = " <- recommended" if rounds == recommended else ""
+    print(f"cost {rounds:>2}: {elapsed_ms:8.1f} ms{marker}")
+
+  print(f"\nCurrent BCRYPT_ROUNDS={BCRYPT_ROUNDS}")
+  print(f"BCRYPT_ROUNDS={recommended}")
+
+
+if __name__ == "__main__":
+  main()
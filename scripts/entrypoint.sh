@@ -0,0 +1,13 @@
+#!/bin/sh
+set -e
+
+# Migrate the schema once per container before any worker starts
+python scripts/migrate.py
+
+# Samples left by workers of a previous run (or by the migration above) would be summed into the livesum gauges
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+  find "$PROMETHEUS_MULTIPROC_DIR" -mindepth 1 -delete
+fi
+
+exec "$@"
@@ -0,0 +1,141 @@
+"""
+Check that every repository read is served by an index on a seeded dataset.
+
+Seeds owners, companies, stores and staff inside a transaction, runs ANALYZE,
+calls the repository read functions while capturing the SQL they send, then
+replays each statement under EXPLAIN. Exits non-zero if any plan contains a
+sequential scan or no index scan. The transaction is rolled back at the end.
+
+Usage:
+    ENVIRONMENT=local python scripts/explain_indexes.py --owners 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Reads must reach the database, not the Valkey cache
+os.environ["CACHE_ENABLED"] = "false"
+
+from sqlalchemy import event, text  # noqa: E402
+from sqlalchemy.dialects.postgresql import insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from constants.Role import Role  # noqa: E402
+from db.database import engine  # noqa: E402
+from db.models import RoleTable  # noqa: E402
+from repository import account, company, store  # noqa: E402
+
+INDEX_SCANS = ("Index Scan", "Index Only Scan", "Bitmap Index Scan")
+
+SEED_SQL = [
+  """
+  INSERT INTO users (id, u_id, email, first_name, last_name, password, email_confirmed, role, deactivated,
+                     created_at, updated_at)
+  SELECT 'explain-owner-' || n, nextval('user_u_id_seq'), 'explain-owner-' || n || '@example.com', 'Owner', 'Explain',
+         'x', true, :owner, false, now(), now()
+  FROM generate_series(1, :owners) AS n
+  """,
+  """
+  INSERT INTO companies (id, c_id, name, uen, email, deactivated, user_id)
+  SELECT 'explain-company-' || o || '-' || n, nextval('company_c_id_seq'), 'Company', 'T00000000X',
+         'company@example.com', n % 10 = 0, 'explain-owner-' || o
+  FROM generate_series(1, :owners) AS o, generate_series(1, :companies) AS n
+  """,
+  """
+  INSERT INTO stores (id, s_id, name, alias, deactivated, company_id)
+  SELECT c.id || '-store-' || n, nextval('store_s_id_seq'), 'Store', 'EX', n % 10 = 0, c.id
+  FROM companies c, generate_series(1, :per_company) AS n
+  WHERE c.id LIKE 'explain-company-%'
+  """,
+  """
+  INSERT INTO users (id, u_id, email, first_name, last_name, password, email_confirmed, role, company_id, deactivated,
+                     created_at, updated_at)
+  SELECT c.id || '-staff-' || n, nextval('user_u_id_seq'), c.id || '-staff-' || n || '@example.com', 'Staff',
+         'Explain', 'x', true, :employee, c.c_id, n % 10 = 0, now(), now()
+  FROM companies c, generate_series(1, :per_company) AS n
+  WHERE c.id LIKE 'explain-company-%'
+  """,
+]
+
+
+async def seed(conn, owners: int, companies: int, per_company: int):
+  await conn.execute(insert(RoleTable).values([
+    {"key": Role.BUSINESS_OWNER, "value": "Business Owner", "hierarchy": 10},
+    {"key": Role.EMPLOYEE, "value": "Employee", "hierarchy": 11},
+  ]).on_conflict_do_nothing())
+  params = {"owners": owners, "companies": companies, "per_company": per_company, "owner": Role.BUSINESS_OWNER,
+            "employee": Role.EMPLOYEE}
+  for statement in SEED_SQL:
+    await conn.execute(text(statement), params)
+  for table in ("users", "companies", "stores"):
+    await conn.exec_driver_sql(f"ANALYZE {table}")
+
+
+async def sample_ids(conn):
+  row = (await conn.execute(text(
+    "SELECT c.c_id, c.user_id, s.s_id, s.id FROM companies c JOIN stores s ON s.company_id = c.id "
+    "WHERE c.id LIKE 'explain-company-%' AND NOT c.deactivated AND NOT s.deactivated LIMIT 1"
+  ))).one()
+  return row.c_id, row.user_id, row.s_id, row.id
+
+
+async def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--owners", type=int, default=1000)
+  parser.add_argument("--companies", type=int, default=2, help="Companies per owner")
+  parser.add_argument("--per-company", type=int, default=10, help="Stores and staff per company")
+  args = parser.parse_args()
+
+  captured = []
+
+  def capture(conn, cursor, statement, parameters, context, executemany):
+    captured.append((statement, parameters))
+
+  async with engine.connect() as conn:
+    transaction = await conn.begin()
+    try:
+      await seed(conn, args.owners, args.companies, args.per_company)
+      c_id, user_id, s_id, store_id = await sample_ids(conn)
+
+      checks = {
+        "get_user_by_email": lambda db: account.get_user_by_email(db, f"{user_id}@example.com"),
+        "get_accounts_by_c_id": lambda db: account.get_accounts_by_c_id(db, c_id),
+        "get_accounts_page_by_c_id": lambda db: account.get_accounts_page_by_c_id(db, c_id, 5, 0),
+        "get_companies_by_user_id": lambda db: company.get_companies_by_user_id(db, user_id),
+        "get_companies_page_by_user_id": lambda db: company.get_companies_page_by_user_id(db, user_id, 5, 0),
+        "get_company_by_c_id": lambda db: company.get_company_by_c_id(db, c_id),
+        "get_stores_by_c_id": lambda db: store.get_stores_by_c_id(db, c_id),
+        "get_stores_page_by_c_id": lambda db: store.get_stores_page_by_c_id(db, c_id, 5, 0),
+        "get_store_by_id": lambda db: store.get_store_by_id(db, s_id),
+        "get_store_by_uuid": lambda db: store.get_store_by_uuid(db, store_id),
+      }
+
+      failures = 0
+      async with AsyncSession(bind=conn, join_transaction_mode="create_savepoint") as db:
+        for name, query in checks.items():
+          captured.clear()
+          event.listen(engine.sync_engine, "before_cursor_execute", capture)
+          try:
+            await query(db)
+          finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+          for statement, parameters in captured:
+            result = await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+            plan = "\n".join(row[0] for row in result)
+            ok = "Seq Scan" not in plan and any(scan in plan for scan in INDEX_SCANS)
+            failures += not ok
+            print(f"{'OK  ' if ok else 'FAIL'} {name}")
+            print("\n".join(f"       {line}" for line in plan.splitlines()))
+    finally:
+      await transaction.rollback()
+  await engine.dispose()
+
+  sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
@@ -0,0 +1,28 @@
+"""
+Release step: upgrade the database to the latest migration before the workers start.
+
+Run by scripts/entrypoint.sh in every container, so production (where workers
+skip migrations on startup) always serves a migrated schema. Safe to run from
+several containers at once; they take turns on the startup advisory lock.
+
+Usage:
+    ENVIRONMENT=local python scripts/migrate.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from db.database import engine, migrate  # noqa: E402
+
+
+async def main():
+  try:
+    await migrate()
+  finally:
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
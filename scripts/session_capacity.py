@@ -0,0 +1,67 @@
+"""
+Report Valkey memory per session and how many sessions fit in a maxmemory budget.
+
+Creates one session in the legacy hash format and one in the compact msgpack
+format, measures them with MEMORY USAGE, then deletes them.
+
+Usage:
+    ENVIRONMENT=local python scripts/session_capacity.py --maxmemory 100mb
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import redis.asyncio as redis  # noqa: E402
+
+from benchmarks.legacy_sessions import create_legacy_session  # noqa: E402
+from db.valkey_client import raw_redis_pool  # noqa: E402
+from session_manager import RECORD_PREFIX, SESSION_PREFIX, TOKEN_PREFIX, USER_TOKENS_PREFIX, create_session, \
+  invalidate_session  # noqa: E402
+
+UNITS = {"kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3}
+
+
+def parse_size(value: str) -> int:
+  value = value.strip().lower()
+  for suffix, factor in UNITS.items():
+    if value.endswith(suffix):
+      return int(float(value[:-len(suffix)]) * factor)
+  return int(value)
+
+
+async def memory_usage(valkey: redis.Redis, *keys: str) -> int:
+  return sum([await valkey.memory_usage(key, samples=0) or 0 for key in keys])
+
+
+async def main():
+  parser = argparse.ArgumentParser(description="Measure bytes per session in Valkey")
+  parser.add_argument("--maxmemory", default="100mb", help="Budget to compute capacity for, e.g. 100mb")
+  args = parser.parse_args()
+
+  maxmemory = parse_size(args.maxmemory)
+  user_data = {"first_name": "Firstname", "last_name": "Lastname", "email_confirmed": True, "role": "EMPLOYEE"}
+  valkey = redis.Redis(connection_pool=raw_redis_pool)
+
+  try:
+    legacy_email = "capacity-legacy@example.com"
+    legacy_token = await create_legacy_session(valkey, legacy_email, "11111111-1111-1111-1111-111111111111", user_data)
+    legacy_bytes = await memory_usage(valkey, f"{TOKEN_PREFIX}{legacy_token}", f"{SESSION_PREFIX}{legacy_email}")
+
+    compact_email = "capacity-compact@example.com"
+    compact_token = await create_session(valkey, compact_email, "22222222-2222-2222-2222-222222222222", user_data)
+    compact_bytes = await memory_usage(valkey, f"{RECORD_PREFIX}{compact_token}", f"{USER_TOKENS_PREFIX}{compact_email}")
+  finally:
+    await invalidate_session(valkey, "capacity-legacy@example.com")
+    await invalidate_session(valkey, "capacity-compact@example.com")
+    await valkey.aclose()
+
+  print(f"{'format':<10}{'bytes/session':>15}{'sessions @ ' + args.maxmemory:>22}")
+  for name, size in (("legacy", legacy_bytes), ("compact", compact_bytes)):
+    print(f"{name:<10}{size:>15}{maxmemory // size if size else 0:>22}")
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
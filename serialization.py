@@ -0,0 +1,73 @@
+import os
+from functools import lru_cache
+from inspect import isclass
+from typing import Any, Callable, Dict, Optional, get_args, get_origin
+
+from fastapi import Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel
+
+from config import load_environment
+
+load_environment()
+
+# Opt-in fast path: orjson responses built by pre-compiled serializers instead of response_model validation
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() == "true"
+
+DEFAULT_RESPONSE_CLASS = ORJSONResponse if FAST_JSON else JSONResponse
+
+Serializer = Callable[[Any], Any]
+
+
+@lru_cache(maxsize=None)
+def serializer_for(schema: type[BaseModel]) -> Serializer:
+  """
+  Build a function turning a trusted ORM row or dict into the aliased dict the schema would produce.
+
+  Field names, aliases and nested schemas are resolved once per schema. Values are copied as they are,
+  without validation, so the result must be encoded with orjson (which handles datetimes).
+  """
+  fields = [(name, field.alias or name, _nested(field.annotation)) for name, field in schema.model_fields.items()]
+
+  def serialize(obj) -> Dict[str, Any]:
+    get = obj.get if isinstance(obj, dict) else obj.__getattribute__
+    out = {}
+    for name, alias, nested in fields:
+      value = get(name)
+      out[alias] = nested(value) if nested is not None and value is not None else value
+    return out
+
+  return serialize
+
+
+def _nested(annotation) -> Optional[Serializer]:
+  """Serializer for a field holding schemas, lists or dicts of schemas, or None for plain values."""
+  if isclass(annotation) and issubclass(annotation, BaseModel):
+    return serializer_for(annotation)
+
+  origin, args = get_origin(annotation), get_args(annotation)
+  if origin is list and args and _nested(args[0]) is not None:
+    item = _nested(args[0])
+    return lambda values: [item(value) for value in values]
+  if origin is dict and len(args) == 2 and _nested(args[1]) is not None:
+    item = _nested(args[1])
+    return lambda values: {key: item(value) for key, value in values.items()}
+  return None
+
+
+def serialize(schema: type[BaseModel], value) -> Any:
+  """Serialize a row, or a list of rows, with the pre-built serializer of schema."""
+  serializer = serializer_for(schema)
+  if isinstance(value, (list, tuple)):
+    return [serializer(row) for row in value]
+  return serializer(value)
+
+
+def render(schema: type[BaseModel], value, response: Optional[Response] = None):
+  """
+  Return value unchanged for FastAPI to validate against the route's response_model, or with FAST_JSON
+  an ORJSONResponse built by the pre-built serializer, carrying the headers already set on response.
+  """
+  if not FAST_JSON:
+    return value
+  return ORJSONResponse(serialize(schema, value), headers=dict(response.headers) if response is not None else None)
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import redis.asyncio as redis
+
+from config import load_environment
+from db.valkey_client import redis_pool
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_ENABLED = os.getenv("SESSION_CACHE_ENABLED", "true").lower() == "true"
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", 10000))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", 30))  # seconds
+
+# invalidate_session publishes the revoked token here so every worker drops it
+SESSION_INVALIDATION_CHANNEL = "session:invalidate"
+
+
+class SessionCache:
+  """
+  Bounded, TTL-based LRU of verified sessions keyed by session token.
+
+  The cache only serves entries while the invalidation listener is subscribed;
+  otherwise a logout on another worker could go unnoticed. Every invalidation
+  bumps generation, so a session verified while one arrived is not cached.
+  """
+
+  def __init__(self, max_size: int, ttl: float):
+    self.max_size = max_size
+    self.ttl = ttl
+    self.active = False
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.expirations = 0
+    self.invalidations = 0
+    self.generation = 0
+    self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+  def get(self, token: str) -> Optional[Dict[str, Any]]:
+    if not self.active:
+      return None
+
+    entry = self._entries.get(token)
+    if entry is None:
+      self.misses += 1
+      return None
+
+    deadline, user_data = entry
+    if deadline < time.monotonic():
+      del self._entries[token]
+      self.expirations += 1
+      self.misses += 1
+      return None
+
+    self._entries.move_to_end(token)
+    self.hits += 1
+    return dict(user_data)
+
+  def put(self, token: str, user_data: Dict[str, Any], expires_at: int, generation: int):
+    """
+    Cache a verified session, never beyond its own expiry.
+
+    generation is the value read before the session was verified; if an invalidation arrived since, the
+    verified data may already be revoked and is not cached.
+    """
+    if not self.active or generation != self.generation:
+      return
+
+    remaining = expires_at - time.time()
+    if remaining <= 0:
+      return
+
+    self._entries[token] = (time.monotonic() + min(self.ttl, remaining), dict(user_data))
+    self._entries.move_to_end(token)
+    while len(self._entries) > self.max_size:
+      self._entries.popitem(last=False)
+      self.evictions += 1
+
+  def invalidate(self, token: str):
+    # Bumped even when the token is not cached yet: it may be in the middle of being verified
+    self.generation += 1
+    if self._entries.pop(token, None) is not None:
+      self.invalidations += 1
+
+  def clear(self):
+    self.generation += 1
+    self._entries.clear()
+
+  def stats(self) -> Dict[str, Any]:
+    lookups = self.hits + self.misses
+    return {
+      "enabled": SESSION_CACHE_ENABLED,
+      "active": self.active,
+      "size": len(self._entries),
+      "max_size": self.max_size,
+      "ttl": self.ttl,
+      "hits": self.hits,
+      "misses": self.misses,
+      "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+      "evictions": self.evictions,
+      "expirations": self.expirations,
+      "invalidations": self.invalidations,
+    }
+
+
+session_cache = SessionCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+_listener: Optional[asyncio.Task] = None
+
+
+async def _listen_for_invalidations():
+  while True:
+    client = redis.Redis(connection_pool=redis_pool)
+    pubsub = client.pubsub()
+    try:
+      await pubsub.subscribe(SESSION_INVALIDATION_CHANNEL)
+      # Anything cached before (re)subscribing may have missed an invalidation
+      session_cache.clear()
+      session_cache.active = True
+
+      async for message in pubsub.listen():
+        if message["type"] == "message":
+          session_cache.invalidate(message["data"])
+    except asyncio.CancelledError:
+      raise
+    except Exception as e:
+      logger.warning(f"Session invalidation listener disconnected: {str(e)}")
+    finally:
+      session_cache.active = False
+      session_cache.clear()
+      await pubsub.aclose()
+      await client.aclose()
+
+    await asyncio.sleep(1)
+
+
+async def start_invalidation_listener():
+  """Subscribe to session invalidations. Called from the application lifespan."""
+  global _listener
+  if SESSION_CACHE_ENABLED and _listener is None:
+    _listener = asyncio.create_task(_listen_for_invalidations(), name="session-invalidation-listener")
+
+
+async def stop_invalidation_listener():
+  global _listener
+  if _listener is not None:
+    _listener.cancel()
+    try:
+      await _listener
+    except asyncio.CancelledError:
+      pass
+    _listener = None
@@ -1,27 +1,134 @@
+import asyncio
+import logging
+import os
 import time
 import uuid
 from typing import Optional, Dict, Any
 
+import msgpack
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import APIKeyHeader
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
 
-from db.valkey_client import get_valkey
+from db.valkey_client import InstrumentedRedis, get_valkey_raw, raw_redis_pool
+from session_cache import SESSION_INVALIDATION_CHANNEL, session_cache
+from session_tokens import SESSION_MODE, decode_signed_token, is_signed_token, issue_signed_token, \
+  revoke_signed_token, revoke_user_tokens, signed_user_data
+
+logger = logging.getLogger(__name__)
 
 # Constants
 SESSION_EXPIRY = 3600  # 1 hour in seconds
+
+# Sliding expiry: once this fraction of SESSION_EXPIRY has passed since the last refresh, the next
+# request pushes expiry out again. SESSION_MAX_LIFETIME caps the total age of a session (0 disables).
+SESSION_REFRESH_FRACTION = float(os.getenv("SESSION_REFRESH_FRACTION", 0.5))
+SESSION_MAX_LIFETIME = int(os.getenv("SESSION_MAX_LIFETIME", 86400))
+
+# Compact format: one msgpack record per session plus a per-user set of its tokens
+RECORD_PREFIX = "sess:"
+USER_TOKENS_PREFIX = "session-tokens:"
+RECORD_VERSION = 1
+
+# Legacy format, still read until existing sessions expire: token -> email string and a hash per email
 SESSION_PREFIX = "session:"
+TOKEN_PREFIX = "token:"
 
 # Header-based auth for protected endpoints
 session_header = APIKeyHeader(name="X-Session-Token", auto_error=False)
 
+# Server-side scripts so each session operation costs a single Valkey round trip.
+# Legacy keys are derived inside the scripts, which is fine on a standalone (non-cluster) Valkey.
+VERIFY_SESSION_SCRIPT = """
+local record = redis.call('GET', KEYS[1])
+if record then
+  return {1, record}
+end
+local email = redis.call('GET', KEYS[2])
+if not email then
+  return nil
+end
+return {0, redis.call('HGETALL', ARGV[1] .. email)}
+"""
+
+INVALIDATE_SESSION_SCRIPT = """
+local found = 0
+for _, token in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+  found = found + redis.call('DEL', ARGV[1] .. token)
+  redis.call('PUBLISH', ARGV[3], token)
+end
+redis.call('DEL', KEYS[1])
+
+if redis.call('EXISTS', KEYS[2]) == 1 then
+  local token = redis.call('HGET', KEYS[2], 'session_token')
+  if token then
+    redis.call('DEL', ARGV[2] .. token)
+    redis.call('PUBLISH', ARGV[3], token)
+  end
+  redis.call('DEL', KEYS[2])
+  found = found + 1
+end
+return found
+"""
+
+# Only refresh sessions that still exist, so a refresh racing a logout cannot resurrect the session.
+# Legacy sessions are migrated to the compact record on their first refresh.
+REFRESH_SESSION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 and redis.call('EXISTS', KEYS[3]) == 0 then
+  return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('SADD', KEYS[2], ARGV[3])
+if redis.call('TTL', KEYS[2]) < tonumber(ARGV[2]) then
+  redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
+_scripts: Dict[str, AsyncScript] = {}
+
+# In-flight refreshes per token, so concurrent requests on this worker trigger a single write
+_refreshes: Dict[str, asyncio.Task] = {}
+_refresh_client = InstrumentedRedis(connection_pool=raw_redis_pool)
+
+
+def _script(valkey: Redis, source: str) -> AsyncScript:
+  """Register a Lua script once per process; the SHA is reused on every call."""
+  script = _scripts.get(source)
+  if script is None:
+    script = _scripts[source] = valkey.register_script(source)
+  return script
+
+
+def encode_session(user_id: str, email: str, created_at: int, expires_at: int, user_data: Dict[str, Any]) -> bytes:
+  """Pack a session into the compact record stored under sess:<token>."""
+  return msgpack.packb([RECORD_VERSION, user_id, email, created_at, expires_at, user_data])
+
+
+def decode_session(session_token: str, record: bytes) -> Dict[str, Any]:
+  """Unpack a compact record into the same shape the legacy hash format produced."""
+  _, user_id, email, created_at, expires_at, user_data = msgpack.unpackb(record)
+  return {
+    "session_token": session_token,
+    "user_id": user_id,
+    "email": email,
+    "created_at": created_at,
+    "expires_at": expires_at,
+    **{f"user_{k}": str(v) for k, v in user_data.items()}
+  }
+
+
+def _decode(value) -> str:
+  return value.decode() if isinstance(value, bytes) else value
+
 
 async def create_session(valkey: Redis, email: str, user_id: str, user_data: Dict[str, Any]) -> str:
   """
   Create a new login session for a user
 
   Args:
-      valkey: Redis client
+      valkey: Redis client returning raw bytes (see get_valkey_raw)
       email: User's email address
       user_id: User's unique ID
       user_data: Additional user data to store
@@ -29,27 +136,22 @@ async def create_session(valkey: Redis, email: str, user_id: str, user_data: Dic
   Returns:
       session_token: The generated session token
   """
+  if SESSION_MODE == "signed":
+    # Self-contained token; nothing is stored in Valkey
+    return issue_signed_token(email, user_id, user_data, SESSION_EXPIRY)
+
   # Generate a unique session token
   session_token = str(uuid.uuid4())
   now = int(time.time())
 
-  # Create session data
-  session_data = {
-    "session_token": session_token,
-    "user_id": user_id,
-    "email": email,
-    "created_at": now,
-    "expires_at": now + SESSION_EXPIRY,
-    **{f"user_{k}": str(v) for k, v in user_data.items()}  # Prefix user data keys and ensure string values
-  }
+  record = encode_session(user_id, email, now, now + SESSION_EXPIRY, user_data)
 
-  # Store two entries:
-  # 1. Map session token to email for quick lookup
-  await valkey.set(f"token:{session_token}", email, ex=SESSION_EXPIRY)
-
-  # 2. Store full session data using email as key
-  await valkey.hset(f"{SESSION_PREFIX}{email}", mapping=session_data)
-  await valkey.expire(f"{SESSION_PREFIX}{email}", SESSION_EXPIRY)
+  # Store the record and index the token under the user in one MULTI/EXEC round trip
+  async with valkey.pipeline(transaction=True) as pipe:
+    pipe.set(f"{RECORD_PREFIX}{session_token}", record, ex=SESSION_EXPIRY)
+    pipe.sadd(f"{USER_TOKENS_PREFIX}{email}", session_token)
+    pipe.expire(f"{USER_TOKENS_PREFIX}{email}", SESSION_EXPIRY)
+    await pipe.execute()
 
   return session_token
 
@@ -59,21 +161,24 @@ async def verify_session(valkey: Redis, session_token: str) -> Optional[Dict[str
   Verify if a session token is valid and return session data
 
   Args:
-      valkey: Redis client
+      valkey: Redis client returning raw bytes (see get_valkey_raw)
       session_token: The session token to verify
 
   Returns:
       Dict of session data or None if session is invalid
   """
-  # Get email from token
-  email = await valkey.get(f"token:{session_token}")
-  if not email:
+  # Read the compact record, falling back to token -> email -> hash for legacy sessions
+  result = await _script(valkey, VERIFY_SESSION_SCRIPT)(
+    keys=[f"{RECORD_PREFIX}{session_token}", f"{TOKEN_PREFIX}{session_token}"], args=[SESSION_PREFIX], client=valkey
+  )
+  if not result or not result[1]:
     return None
 
-  # Get session data
-  session_data = await valkey.hgetall(f"{SESSION_PREFIX}{email}")
-  if not session_data:
-    return None
+  compact, payload = result
+  if compact:
+    session_data = decode_session(session_token, payload)
+  else:
+    session_data = {_decode(k): _decode(v) for k, v in zip(payload[::2], payload[1::2])}
 
   # Check if session has expired
   now = int(time.time())
@@ -81,40 +186,93 @@ async def verify_session(valkey: Redis, session_token: str) -> Optional[Dict[str
 
   if expires_at < now:
     # Clean up expired session
-    await invalidate_session(valkey, email)
+    await invalidate_session(valkey, session_data.get("email"))
     return None
 
+  _schedule_refresh(session_token, session_data, now)
+
   # Return session data
   return session_data
 
 
-async def invalidate_session(valkey: Redis, email: str) -> bool:
+def _schedule_refresh(session_token: str, session_data: Dict[str, Any], now: int):
+  """Extend the session in the background once it is past the refresh threshold."""
+  if session_token in _refreshes:
+    return
+
+  expires_at = int(session_data["expires_at"])
+  last_refreshed = expires_at - SESSION_EXPIRY
+  if now - last_refreshed < SESSION_EXPIRY * SESSION_REFRESH_FRACTION:
+    return
+
+  new_expires_at = now + SESSION_EXPIRY
+  if SESSION_MAX_LIFETIME:
+    new_expires_at = min(new_expires_at, int(session_data["created_at"]) + SESSION_MAX_LIFETIME)
+  if new_expires_at <= expires_at:
+    return
+
+  task = asyncio.create_task(_refresh_session(session_token, session_data, new_expires_at))
+  _refreshes[session_token] = task
+  task.add_done_callback(lambda _: _refreshes.pop(session_token, None))
+
+
+async def _refresh_session(session_token: str, session_data: Dict[str, Any], expires_at: int):
+  user_data = {k[5:]: v for k, v in session_data.items() if k.startswith("user_") and k != "user_id"}
+  email = session_data["email"]
+  record = encode_session(session_data["user_id"], email, int(session_data["created_at"]), expires_at, user_data)
+
+  try:
+    await _script(_refresh_client, REFRESH_SESSION_SCRIPT)(
+      keys=[f"{RECORD_PREFIX}{session_token}", f"{USER_TOKENS_PREFIX}{email}", f"{TOKEN_PREFIX}{session_token}"],
+      args=[record, expires_at - int(time.time()), session_token],
+      client=_refresh_client
+    )
+  except Exception as e:
+    logger.warning(f"Failed to refresh session expiry: {str(e)}")
+
+
+async def invalidate_session(valkey: Redis, email: str, session_token: Optional[str] = None) -> bool:
   """Invalidate a user session (logout)"""
-  # Get session token
-  session_data = await valkey.hgetall(f"{SESSION_PREFIX}{email}")
-  if not session_data:
-    return False
+  if session_token and is_signed_token(session_token):
+    return await revoke_signed_token(valkey, session_token)
 
-  session_token = session_data.get("session_token")
+  # Delete the user's sessions in either format, and tell every worker to drop its cached copies
+  deleted = await _script(valkey, INVALIDATE_SESSION_SCRIPT)(
+    keys=[f"{USER_TOKENS_PREFIX}{email}", f"{SESSION_PREFIX}{email}"],
+    args=[RECORD_PREFIX, TOKEN_PREFIX, SESSION_INVALIDATION_CHANNEL],
+    client=valkey
+  )
+  return bool(deleted)
 
-  # Delete both entries
-  if session_token:
-    await valkey.delete(f"token:{session_token}")
 
-  await valkey.delete(f"{SESSION_PREFIX}{email}")
-  return True
+async def invalidate_user_sessions(valkey: Redis, email: str, user_id: str):
+  """Invalidate every session of a user, e.g. when the account is deactivated."""
+  await invalidate_session(valkey, email)
+  await revoke_user_tokens(valkey, user_id, SESSION_EXPIRY)
 
 
 # FastAPI dependency for protected routes
 async def get_current_user(
   request: Request,
   session_token: str = Depends(session_header),
-  valkey: Redis = Depends(get_valkey)
+  valkey: Redis = Depends(get_valkey_raw)
 ) -> Dict[str, Any]:
   """Dependency to verify session and get current user info"""
   if not session_token:
     raise HTTPException(status_code=401, detail="Not authenticated")
 
+  if is_signed_token(session_token):
+    # Verified in-process against the signature and the synced revocation list
+    payload = decode_signed_token(session_token)
+    if not payload:
+      raise HTTPException(status_code=401, detail="Session expired or invalid")
+    return signed_user_data(payload)
+
+  cached = session_cache.get(session_token)
+  if cached is not None:
+    return cached
+
+  generation = session_cache.generation
   session_data = await verify_session(valkey, session_token)
   if not session_data:
     raise HTTPException(status_code=401, detail="Session expired or invalid")
@@ -130,4 +288,5 @@ async def get_current_user(
     if key.startswith("user_") and key != "user_id":
       user_data[key[5:]] = value  # Remove "user_" prefix
 
+  session_cache.put(session_token, user_data, int(session_data.get("expires_at", 0)), generation)
   return user_data
@@ -0,0 +1,204 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional, Set
+
+from redis.asyncio import Redis
+
+from config import load_environment
+from db.valkey_client import InstrumentedRedis, redis_pool
+
+load_environment()
+
+logger = logging.getLogger(__name__)
+
+# "opaque" issues random tokens backed by Valkey, "signed" issues self-contained HMAC tokens
+SESSION_MODE = os.getenv("SESSION_MODE", "opaque").lower()
+SESSION_SIGNING_KEY = os.getenv("SESSION_SIGNING_KEY", "")
+REVOCATION_SYNC_INTERVAL = float(os.getenv("SESSION_REVOCATION_SYNC_INTERVAL", 2))  # seconds
+
+if SESSION_MODE == "signed" and not SESSION_SIGNING_KEY:
+  raise ValueError("SESSION_SIGNING_KEY is not set. It is required when SESSION_MODE=signed.")
+
+SIGNED_TOKEN_PREFIX = "v1."
+
+# Sorted set of revocations scored by the time they can be forgotten:
+#   jti:<jti>                      a single token
+#   user:<user_id>:<revoked_at>    every token of a user issued at or before revoked_at (epoch seconds, ms precision)
+REVOCATION_KEY = "session:revoked"
+
+_signing_key = SESSION_SIGNING_KEY.encode()
+
+
+def _b64encode(data: bytes) -> str:
+  return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+  return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(body: str) -> str:
+  return _b64encode(hmac.new(_signing_key, body.encode(), hashlib.sha256).digest())
+
+
+def is_signed_token(token: str) -> bool:
+  return bool(_signing_key) and token.startswith(SIGNED_TOKEN_PREFIX)
+
+
+def issue_signed_token(email: str, user_id: str, user_data: Dict[str, Any], expiry: int) -> str:
+  """Create an HMAC-signed token carrying everything get_current_user needs."""
+  now = time.time()
+  payload = {
+    "sub": user_id,
+    "email": email,
+    # Millisecond precision, so a token issued right after a user revocation is not caught by it
+    "iat": round(now, 3),
+    "exp": int(now) + expiry,
+    "jti": uuid.uuid4().hex,
+    "data": {k: str(v) for k, v in user_data.items()},
+  }
+  body = SIGNED_TOKEN_PREFIX + _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+  return f"{body}.{_sign(body)}"
+
+
+def decode_signed_token(token: str) -> Optional[Dict[str, Any]]:
+  """Return the token payload if the signature is valid, it has not expired and it is not revoked."""
+  body, _, signature = token.rpartition(".")
+  # Compared as bytes: compare_digest raises TypeError on str with non-ASCII characters from a forged header
+  if not body or not hmac.compare_digest(signature.encode(), _sign(body).encode()):
+    return None
+
+  try:
+    payload = json.loads(_b64decode(body[len(SIGNED_TOKEN_PREFIX):]))
+  except ValueError:
+    return None
+
+  if payload.get("exp", 0) < time.time() or revocations.is_revoked(payload):
+    return None
+  return payload
+
+
+class RevocationList:
+  """In-memory copy of the Valkey revocation set, refreshed in the background."""
+
+  def __init__(self):
+    self.tokens: Set[str] = set()
+    self.users: Dict[str, float] = {}
+    self.last_synced: Optional[float] = None
+    # Revocations made by this worker that a sync has not returned yet, with the time they can be forgotten
+    self._local: Dict[str, float] = {}
+
+  def is_revoked(self, payload: Dict[str, Any]) -> bool:
+    if payload.get("jti") in self.tokens:
+      return True
+    revoked_at = self.users.get(payload.get("sub"))
+    return revoked_at is not None and payload.get("iat", 0) <= revoked_at
+
+  def apply(self, member: str):
+    kind, _, value = member.partition(":")
+    if kind == "jti":
+      self.tokens.add(value)
+    elif kind == "user":
+      user_id, _, revoked_at = value.rpartition(":")
+      self.users[user_id] = max(self.users.get(user_id, 0), float(revoked_at))
+
+  def add_local(self, member: str, forget_at: float):
+    self._local[member] = forget_at
+    self.apply(member)
+
+  def replace(self, members):
+    """
+    Swap in the members read from Valkey, keeping local revocations the read did not include yet.
+
+    The read may have started before this worker's own write landed; dropping those would make a revoked
+    token valid again here until the next sync.
+    """
+    members = set(members)
+    now = time.time()
+    self._local = {
+      member: forget_at for member, forget_at in self._local.items() if member not in members and forget_at > now
+    }
+    self.tokens = set()
+    self.users = {}
+    for member in members | self._local.keys():
+      self.apply(member)
+    self.last_synced = now
+
+
+revocations = RevocationList()
+
+
+async def _add_revocation(valkey: Redis, member: str, forget_at: float):
+  revocations.add_local(member, forget_at)
+  async with valkey.pipeline(transaction=False) as pipe:
+    pipe.zadd(REVOCATION_KEY, {member: forget_at})
+    pipe.zremrangebyscore(REVOCATION_KEY, "-inf", time.time())
+    await pipe.execute()
+
+
+async def revoke_signed_token(valkey: Redis, token: str) -> bool:
+  """Revoke a single signed token until it would have expired anyway."""
+  payload = decode_signed_token(token)
+  if not payload:
+    return False
+  await _add_revocation(valkey, f"jti:{payload['jti']}", payload["exp"])
+  return True
+
+
+async def revoke_user_tokens(valkey: Redis, user_id: str, expiry: int):
+  """Revoke every signed token issued to a user up to now. Does nothing when signed tokens are disabled."""
+  if not _signing_key:
+    return
+  now = time.time()
+  await _add_revocation(valkey, f"user:{user_id}:{now:.3f}", now + expiry)
+
+
+async def sync_revocations(valkey: Redis):
+  members = await valkey.zrangebyscore(REVOCATION_KEY, time.time(), "+inf")
+  revocations.replace(members)
+
+
+_sync_task: Optional[asyncio.Task] = None
+
+
+async def _sync_loop():
+  client = InstrumentedRedis(connection_pool=redis_pool)
+  try:
+    while True:
+      try:
+        await sync_revocations(client)
+      except Exception as e:
+        logger.warning(f"Failed to sync session revocations: {str(e)}")
+      await asyncio.sleep(REVOCATION_SYNC_INTERVAL)
+  finally:
+    await client.aclose()
+
+
+async def start_revocation_sync():
+  """Keep the in-memory revocation list current. Called from the application lifespan."""
+  global _sync_task
+  if _signing_key and _sync_task is None:
+    _sync_task = asyncio.create_task(_sync_loop(), name="session-revocation-sync")
+
+
+async def stop_revocation_sync():
+  global _sync_task
+  if _sync_task is not None:
+    _sync_task.cancel()
+    try:
+      await _sync_task
+    except asyncio.CancelledError:
+      pass
+    _sync_task = None
+
+
+def signed_user_data(payload: Dict[str, Any]) -> Dict[str, Any]:
+  """Build the get_current_user result from a token payload."""
+  return {"user_id": payload["sub"], "email": payload["email"], **payload.get("data", {})}
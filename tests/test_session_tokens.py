@@ -0,0 +1,30 @@
+import os
+import time
+
+# Signed tokens are only verified when a signing key is configured; read at import
+os.environ.setdefault("SESSION_SIGNING_KEY", "test-signing-key")
+
+from session_tokens import RevocationList, decode_signed_token, issue_signed_token  # noqa: E402
+
+
+def test_signature_with_non_ascii_characters_is_rejected():
+  token = issue_signed_token("user@example.com", "user-1", {}, 3600)
+  body = token.rpartition(".")[0]
+
+  assert decode_signed_token(token) is not None
+  assert decode_signed_token(f"{body}.é") is None
+  assert decode_signed_token("v1.abc.é") is None
+
+
+def test_sync_keeps_local_revocations_missing_from_the_read():
+  revocations = RevocationList()
+  revocations.add_local("jti:revoked-during-sync", time.time() + 60)
+
+  # The read started before this worker's write landed
+  revocations.replace(["jti:other"])
+  assert revocations.tokens == {"revoked-during-sync", "other"}
+
+  # Once a sync returns it, Valkey is the source of truth again
+  revocations.replace(["jti:revoked-during-sync"])
+  revocations.replace([])
+  assert revocations.tokens == set()